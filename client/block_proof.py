@@ -0,0 +1,43 @@
+import hashlib
+from typing import List
+
+from pydantic import BaseModel
+
+
+class BlockHeader(BaseModel):
+    index: int
+    previous_hash: str
+    difficulty: int
+    timestamp: float
+    nonce: int
+    merkle_root: str
+
+    def calculate_hash(self):
+        return hashlib.sha256(self.model_dump_json().encode()).hexdigest()
+
+
+def hash_merkle_pair(left: str, right: str) -> str:
+    return hashlib.sha256((left + right).encode()).hexdigest()
+
+
+def calculate_root_from_branch(tx_id: str, branch: List[dict]) -> str:
+    current = tx_id
+    for node in branch:
+        if node["isLeft"]:
+            current = hash_merkle_pair(node["hash"], current)
+        else:
+            current = hash_merkle_pair(current, node["hash"])
+    return current
+
+
+def verify_transaction_proof(proof: dict) -> bool:
+    """
+    Sprawdza dowód włączenia transakcji: hash nagłówka, trudność (PoW) i gałąź Merkle.
+    """
+    header = BlockHeader(**proof["header"])
+    block_hash = header.calculate_hash()
+    if block_hash != proof["blockHash"]:
+        return False
+    if int(block_hash, 16) >= 1 << max(256 - header.difficulty, 0):
+        return False
+    return calculate_root_from_branch(proof["txId"], proof["branch"]) == header.merkle_root
@@ -6,6 +6,7 @@ from tkinter import messagebox, Toplevel, simpledialog, ttk
 from cryptography.hazmat.primitives.asymmetric import ec
 
 from client.transaction import TxOut, TxIn, TransactionData, Transaction
+from client.block_proof import verify_transaction_proof
 from wallet import generate_key, load_private_key
 from wallet import sanitize_identity_name
 from cryptography.hazmat.primitives import serialization, hashes
@@ -77,6 +78,10 @@ class CryptoWalletApp:
         self.show_public_key_button = tk.Button(frame_left, text="Pokaż klucz publiczny", command=self.show_public_key, width=30)
         self.show_public_key_button.grid(row=7, column=0, padx=5, pady=5)
 
+        # Przycisk do weryfikacji transakcji (dowód Merkle)
+        self.verify_transaction_button = tk.Button(frame_left, text="Sprawdź transakcję", command=self.verify_transaction, width=30)
+        self.verify_transaction_button.grid(row=8, column=0, padx=5, pady=5)
+
         # Sekcja testowania połączenia z nodem
         frame_bottom = tk.Frame(self.root)
         frame_bottom.grid(row=1, column=0, columnspan=2, padx=10, pady=10, sticky="ew")
@@ -308,6 +313,33 @@ class CryptoWalletApp:
         except Exception as e:
             messagebox.showerror("Błąd", f"Nie udało się połączyć z nodem: {str(e)}")
 
+    def verify_transaction(self):
+        """Pobiera dowód Merkle dla transakcji i weryfikuje go lokalnie."""
+        node_address = self.node_address_entry.get()
+        if not node_address:
+            messagebox.showerror("Błąd", "Adres noda nie może być pusty!")
+            return
+
+        tx_id = simpledialog.askstring("Sprawdź transakcję", "Identyfikator transakcji (txId):")
+        if not tx_id:
+            return
+
+        try:
+            response = requests.get(f"http://{node_address}/txProof", params={"txId": tx_id.strip()}, verify=False)
+            if response.status_code == 404:
+                messagebox.showinfo("Wynik", "Transakcja nie jest jeszcze zatwierdzona w głównym łańcuchu.")
+                return
+            response.raise_for_status()
+            proof = response.json()
+
+            if verify_transaction_proof(proof):
+                messagebox.showinfo("Sukces", f"Transakcja zatwierdzona w bloku #{proof['header']['index']}, "
+                                              f"potwierdzenia: {proof['confirmations']}")
+            else:
+                messagebox.showerror("Błąd", "Dowód Merkle otrzymany od noda jest niepoprawny!")
+        except Exception as e:
+            messagebox.showerror("Błąd", f"Nie udało się zweryfikować transakcji: {str(e)}")
+
     def generate_identity(self):
         """Generuje nowy klucz prywatny EC i zapisuje go do pliku zaszyfrowanego AES-GCM."""
         identity_name = self.identity_name_entry.get()
@@ -1,11 +1,20 @@
 import logging
+from typing import List, Tuple
 
 from flask import request, jsonify, render_template
 
-from client.broadcast import broadcast_transaction_into_network
+from pydantic import ValidationError
+
+from client.broadcast import broadcast_transaction_into_network, broadcast_transactions_into_network, \
+    get_broadcast_stats
 from flask_app import flask_app
 from state.node_state import nodeState
 from state.transaction import Transaction
+from utils.miner_job import minerController
+from validation.signature_cache import signatureCache
+from validation.validation import get_public_key_cache_stats
+
+MAX_BATCH_TRANSACTIONS = 10000
 
 
 @flask_app.route('/', methods=['GET'])
@@ -36,6 +45,21 @@ def broadcast():
     return "Message broadcasted"
 
 
+@flask_app.route('/broadcastBatch', methods=['POST'])
+def broadcast_batch():
+    try:
+        results, parsed_transactions = parse_transaction_batch(request.get_json(silent=True))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    logging.info(f"Received batch of {len(results)} transactions")
+
+    accepted_transactions = add_transaction_batch_to_mempool(parsed_transactions)
+    if accepted_transactions and not nodeState.evil_mode:
+        broadcast_transactions_into_network(accepted_transactions)
+
+    return jsonify({"results": results})
+
+
 @flask_app.route('/mempool', methods=['GET'])
 def get_mempool():
     return jsonify([transaction.model_dump() for transaction in nodeState.mempool])
@@ -51,3 +75,55 @@ def get_balance():
         "balance": sum([utxo["amount"] for utxo in utxos]),
         "uTxOs": utxos
     })
+
+
+@flask_app.route('/txProof', methods=['GET'])
+def get_transaction_proof():
+    proof = nodeState.get_transaction_proof(request.args.get("txId", ""))
+    if proof is None:
+        return jsonify({"error": "Transaction not found in main chain"}), 404
+
+    return jsonify(proof)
+
+
+@flask_app.route('/stats', methods=['GET'])
+def get_stats():
+    return jsonify({
+        "miner": minerController.get_stats(),
+        "signatureCache": signatureCache.get_stats(),
+        "publicKeyCache": get_public_key_cache_stats(),
+        "peers": get_broadcast_stats()
+    })
+
+
+def parse_transaction_batch(body) -> Tuple[List[dict], List[Tuple[dict, Transaction]]]:
+    transactions_json = body.get("transactions") if isinstance(body, dict) else None
+    if not isinstance(transactions_json, list):
+        raise ValueError("Request body must contain a list of transactions")
+    if len(transactions_json) > MAX_BATCH_TRANSACTIONS:
+        raise ValueError(f"Batch can contain at most {MAX_BATCH_TRANSACTIONS} transactions")
+
+    results = []
+    parsed_transactions = []
+    for transaction_json in transactions_json:
+        try:
+            transaction = Transaction(**transaction_json)
+        except (TypeError, ValidationError) as e:
+            results.append({"txId": None, "accepted": False, "error": f"Malformed transaction: {e}"})
+            continue
+        result = {"txId": transaction.txId, "accepted": True, "error": None}
+        results.append(result)
+        parsed_transactions.append((result, transaction))
+    return results, parsed_transactions
+
+
+def add_transaction_batch_to_mempool(parsed_transactions: List[Tuple[dict, Transaction]]) -> List[Transaction]:
+    errors = nodeState.add_transactions_to_mempool([transaction for _, transaction in parsed_transactions])
+    accepted_transactions = []
+    for (result, transaction), error in zip(parsed_transactions, errors):
+        if error is None:
+            accepted_transactions.append(transaction)
+        else:
+            result["accepted"] = False
+            result["error"] = error
+    return accepted_transactions
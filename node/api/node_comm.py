@@ -1,25 +1,86 @@
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
-from client.broadcast import broadcast_transaction_into_network, broadcast_block_into_network
+from api.client_comm import parse_transaction_batch, add_transaction_batch_to_mempool
+from client.broadcast import broadcast_transaction_into_network, broadcast_block_into_network, \
+    broadcast_transactions_into_network, request_inventory_data, request_compact_blocks, request_block_transactions
+from client.sync import sync_blockchain
 from flask_app import flask_app
-from flask import request, jsonify
+from flask import request, jsonify, Response
 
 from state.block import Block
 from state.node_state import nodeState
 from state.transaction import Transaction
+from state.compact_block import CompactBlock, fill_compact_block
+from state.wire_format import WIRE_CONTENT_TYPE, encode_message, encode_compact_blocks
+
+relay_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="relay")
+orphan_sync_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="orphan-sync")
+orphan_sync_lock = threading.Lock()
+pending_orphan_blocks = {}
+
+MAX_HEADERS_PER_REQUEST = 2000
+MAX_BLOCKS_PER_REQUEST = 100
 
 
 @flask_app.route('/allBlocks', methods=['GET'])
 def get_all_blocks():
-    return jsonify(nodeState.get_dumped_blockchain())
+    since_height = request.args.get("sinceHeight", 0, type=int)
+    etag = nodeState.get_blockchain_etag(since_height)
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+        response.set_etag(etag)
+        return response
+
+    blocks = nodeState.get_blocks_since(since_height)
+    response = Response(stream_blocks(blocks), mimetype="application/x-ndjson")
+    response.set_etag(etag)
+    return response
+
+
+def stream_blocks(blocks):
+    for block in blocks:
+        yield nodeState.get_serialized_block(block) + b"\n"
+
+
+@flask_app.route('/headers', methods=['GET'])
+def get_headers():
+    from_height = request.args.get("from", 0, type=int)
+    count = min(request.args.get("count", MAX_HEADERS_PER_REQUEST, type=int), MAX_HEADERS_PER_REQUEST)
+    blocks = nodeState.get_main_chain_blocks(from_height, count)
+    return jsonify([{
+        "hash": block.hash,
+        "data": block.data.model_dump(exclude={"transactions"})
+    } for block in blocks])
+
+
+@flask_app.route('/blocks', methods=['GET'])
+def get_blocks():
+    from_height = request.args.get("from", 0, type=int)
+    count = min(request.args.get("count", MAX_BLOCKS_PER_REQUEST, type=int), MAX_BLOCKS_PER_REQUEST)
+    if accepts_wire_format():
+        blocks = [nodeState.get_full_block(block) for block in nodeState.get_main_chain_blocks(from_height, count)]
+        return Response(encode_message(blocks, []), mimetype=WIRE_CONTENT_TYPE)
+    return Response(nodeState.get_serialized_main_chain_blocks(from_height, count), mimetype="application/json")
+
+
+def accepts_wire_format() -> bool:
+    return request.accept_mimetypes.best_match(["application/json", WIRE_CONTENT_TYPE]) == WIRE_CONTENT_TYPE
 
 
 @flask_app.route('/broadcastTransaction', methods=['POST'])
 def broadcast_transaction():
     logging.info(f"Broadcasting transaction : {request.get_json()}")
     t = request.get_json()
-    tr = Transaction(**t["transaction"])
-    nodeState.add_transaction_to_mempool(tr)
+    if nodeState.is_transaction_known(t["transaction"]["txId"]):
+        return jsonify(success=True)
+    try:
+        tr = Transaction(**t["transaction"])
+        nodeState.add_transaction_to_mempool(tr)
+    except ValueError as e:
+        logging.info(f"Rejected transaction {t['transaction'].get('txId')}: {e}")
+        return jsonify(success=False, error=str(e))
     broadcast_transaction_into_network({
         "transaction": tr,
         "callback": nodeState.get_callback_address()
@@ -28,9 +89,27 @@ def broadcast_transaction():
     return jsonify(success=True)
 
 
+@flask_app.route('/broadcastTransactionBatch', methods=['POST'])
+def broadcast_transaction_batch():
+    t = request.get_json(silent=True)
+    try:
+        results, parsed_transactions = parse_transaction_batch(t)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    logging.info(f"Received batch of {len(results)} transactions from {t.get('callback')}")
+
+    accepted_transactions = add_transaction_batch_to_mempool(parsed_transactions)
+    if accepted_transactions:
+        broadcast_transactions_into_network(accepted_transactions, address_to_skip=t.get("callback"))
+
+    return jsonify({"success": True, "results": results})
+
+
 @flask_app.route('/blockBroadcast', methods=['POST'])
 def broadcast_block():
     t = request.get_json()
+    if nodeState.is_block_known(t["block"]["hash"]):
+        return "Block already known", 200
     block: Block = Block(**t["block"])
     logging.info(f"Received broadcast block {block.data.index} from {t['callback']}")
     try:
@@ -44,6 +123,200 @@ def broadcast_block():
     return "Block broadcasted", 200
 
 
+@flask_app.route('/inv', methods=['POST'])
+def inventory():
+    t = request.get_json()
+    block_hashes = []
+    for block_hash in t.get("blocks", []):
+        if block_hash in nodeState.blockchain_blocks:
+            continue
+        if nodeState.seen_blocks.add(block_hash):
+            block_hashes.append(block_hash)
+        else:
+            nodeState.block_announcers.add(block_hash, t["callback"])
+
+    tx_ids = []
+    for tx_id in t.get("transactions", []):
+        if tx_id in nodeState.mempool or tx_id in nodeState.transaction_block_hashes:
+            continue
+        if nodeState.seen_transactions.add(tx_id):
+            tx_ids.append(tx_id)
+        else:
+            nodeState.transaction_announcers.add(tx_id, t["callback"])
+
+    if block_hashes or tx_ids:
+        relay_executor.submit(fetch_announced_data, t["callback"], block_hashes, tx_ids)
+
+    return jsonify({"blocks": len(block_hashes), "transactions": len(tx_ids)})
+
+
+@flask_app.route('/getData', methods=['POST'])
+def get_data():
+    t = request.get_json()
+    blocks, transactions = nodeState.get_inventory_data(t.get("blocks", []), t.get("transactions", []))
+    if accepts_wire_format():
+        return Response(encode_message(blocks, transactions), mimetype=WIRE_CONTENT_TYPE)
+    return jsonify({
+        "blocks": [block.model_dump() for block in blocks],
+        "transactions": [transaction.model_dump() for transaction in transactions]
+    })
+
+
+@flask_app.route('/compactBlocks', methods=['POST'])
+def get_compact_blocks():
+    t = request.get_json()
+    compact_blocks = nodeState.get_compact_blocks(t.get("blocks", []))
+    if accepts_wire_format():
+        return Response(encode_compact_blocks(compact_blocks), mimetype=WIRE_CONTENT_TYPE)
+    return jsonify([compact_block.model_dump() for compact_block in compact_blocks])
+
+
+@flask_app.route('/blockTransactions', methods=['POST'])
+def get_block_transactions():
+    t = request.get_json()
+    transactions = nodeState.get_block_transactions(t["hash"], t.get("indexes", []))
+    if transactions is None:
+        return jsonify({"error": "Block transactions not available"}), 404
+    if accepts_wire_format():
+        return Response(encode_message([], transactions), mimetype=WIRE_CONTENT_TYPE)
+    return jsonify({"blocks": [], "transactions": [transaction.model_dump() for transaction in transactions]})
+
+
+def fetch_announced_data(peer, block_hashes, tx_ids):
+    try:
+        blocks = []
+        compact_blocks = request_compact_blocks(peer, block_hashes) if block_hashes else None
+        for compact_block in compact_blocks or []:
+            block = reconstruct_compact_block(peer, compact_block)
+            if block is not None:
+                blocks.append(block)
+
+        reconstructed_block_hashes = {block.hash for block in blocks}
+        full_block_hashes = [block_hash for block_hash in block_hashes if block_hash not in reconstructed_block_hashes]
+        transactions = []
+        if full_block_hashes or tx_ids:
+            data = request_inventory_data(peer, full_block_hashes, tx_ids)
+            if data is not None:
+                full_blocks, transactions = data
+                blocks.extend(full_blocks)
+
+        requested_block_hashes = set(block_hashes)
+        blocks = [block for block in blocks if block.hash in requested_block_hashes]
+        requested_tx_ids = set(tx_ids)
+        transactions = [transaction for transaction in transactions if transaction.txId in requested_tx_ids]
+        returned_block_hashes = {block.hash for block in blocks}
+        returned_tx_ids = {transaction.txId for transaction in transactions}
+        retry_inventory(peer, [block_hash for block_hash in block_hashes if block_hash not in returned_block_hashes],
+                        [tx_id for tx_id in tx_ids if tx_id not in returned_tx_ids])
+
+        orphan_blocks = []
+        invalid_block_hashes = []
+        for block in blocks:
+            logging.info(f"Received announced block {block.data.index} from {peer}")
+            try:
+                nodeState.append_block(block)
+            except ValueError as e:
+                logging.error(f"Error appending block: {e}")
+                if block.data.previous_hash not in nodeState.blockchain_blocks:
+                    orphan_blocks.append(block)
+                elif block.hash not in nodeState.blockchain_blocks:
+                    invalid_block_hashes.append(block.hash)
+                else:
+                    nodeState.block_announcers.discard(block.hash)
+                continue
+            nodeState.block_announcers.discard(block.hash)
+            broadcast_block_into_network(block, nodeState.get_callback_address(), address_to_skip=peer)
+
+        if invalid_block_hashes:
+            retry_inventory(peer, invalid_block_hashes, [])
+        if orphan_blocks:
+            schedule_orphan_sync(peer, orphan_blocks)
+
+        for transaction in transactions:
+            nodeState.transaction_announcers.discard(transaction.txId)
+        if transactions:
+            errors = nodeState.add_transactions_to_mempool(transactions)
+            accepted_transactions = [transaction for transaction, error in zip(transactions, errors) if error is None]
+            if accepted_transactions:
+                broadcast_transactions_into_network(accepted_transactions, address_to_skip=peer)
+    except Exception as e:
+        logging.error(f"Error processing inventory from {peer}: {e}")
+
+
+def reconstruct_compact_block(peer, compact_block: CompactBlock) -> Block | None:
+    try:
+        slots, missing_indexes = nodeState.match_compact_block(compact_block)
+    except ValueError as e:
+        logging.warning(f"Invalid compact block {compact_block.hash} from {peer}: {e}")
+        return None
+
+    missing_transactions = []
+    if missing_indexes:
+        missing_transactions = request_block_transactions(peer, compact_block.hash, missing_indexes)
+        if missing_transactions is None:
+            return None
+
+    block = fill_compact_block(compact_block, slots, missing_indexes, missing_transactions)
+    if block is None:
+        logging.info(f"Could not reconstruct compact block {compact_block.hash}, requesting full block")
+        return None
+    logging.info(f"Reconstructed block {block.data.index} with {len(slots) - len(missing_indexes)}/{len(slots)} "
+                 f"transactions known")
+    return block
+
+
+def retry_inventory(peer, block_hashes, tx_ids):
+    retries = {}
+    for block_hash in block_hashes:
+        nodeState.seen_blocks.discard(block_hash)
+        next_peer = nodeState.block_announcers.pop(block_hash, skip=peer)
+        if next_peer is not None and nodeState.seen_blocks.add(block_hash):
+            retries.setdefault(next_peer, ([], []))[0].append(block_hash)
+    for tx_id in tx_ids:
+        nodeState.seen_transactions.discard(tx_id)
+        next_peer = nodeState.transaction_announcers.pop(tx_id, skip=peer)
+        if next_peer is not None and nodeState.seen_transactions.add(tx_id):
+            retries.setdefault(next_peer, ([], []))[1].append(tx_id)
+
+    for next_peer, (retry_block_hashes, retry_tx_ids) in retries.items():
+        logging.info(f"Requesting {len(retry_block_hashes)} blocks and {len(retry_tx_ids)} transactions "
+                      f"missing from {peer} from {next_peer}")
+        relay_executor.submit(fetch_announced_data, next_peer, retry_block_hashes, retry_tx_ids)
+
+
+def schedule_orphan_sync(peer, orphan_blocks):
+    with orphan_sync_lock:
+        pending_blocks = pending_orphan_blocks.setdefault(peer, {})
+        is_scheduled = bool(pending_blocks)
+        pending_blocks.update({block.hash: block for block in orphan_blocks})
+    if not is_scheduled:
+        orphan_sync_executor.submit(sync_orphan_blocks, peer)
+
+
+def sync_orphan_blocks(peer):
+    with orphan_sync_lock:
+        orphan_blocks = list(pending_orphan_blocks.pop(peer, {}).values())
+    if not orphan_blocks:
+        return
+
+    logging.info(f"Parent of {len(orphan_blocks)} announced blocks is unknown, syncing from {peer}")
+    try:
+        sync_blockchain([peer])
+    except Exception as e:
+        logging.error(f"Error syncing orphan blocks from {peer}: {e}")
+    for block in orphan_blocks:
+        if block.hash not in nodeState.blockchain_blocks and block.data.previous_hash in nodeState.blockchain_blocks:
+            try:
+                nodeState.append_block(block)
+            except ValueError as e:
+                logging.error(f"Error appending block: {e}")
+        if block.hash in nodeState.blockchain_blocks:
+            nodeState.block_announcers.discard(block.hash)
+            broadcast_block_into_network(block, nodeState.get_callback_address(), address_to_skip=peer)
+        else:
+            nodeState.seen_blocks.discard(block.hash)
+
+
 @flask_app.route('/handshake', methods=['POST'])
 def handshake():
     logging.info(f"Handshake request from {request.remote_addr}")
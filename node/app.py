@@ -1,24 +1,28 @@
 import argparse
 import logging
+import os
+import sys
+import threading
 from argparse import Namespace
 
-from apscheduler.schedulers.background import BackgroundScheduler
-
-from client.broadcast import init_handshake, get_blockchain
+from client.broadcast import init_handshake, init_broadcast_engine
+from client.sync import sync_blockchain, sync_snapshot_history
 from key_generator import get_pub_key_hex_str
 
 from api.client_comm import *
 from api.node_comm import *
 from api.client_comm import *
 
+from state.block_store import BlockStore
 from state.node_state import nodeState
-from utils.miner_job import miner_scheduled_job
+from state.utxo_snapshot import read_snapshot, write_snapshot
+from utils.miner_job import minerController
+from utils.mining import init_mining_pool
+from validation.signature_cache import signatureCache
+from validation.verification_pool import init_verification_pool
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-logger = logging.getLogger('apscheduler')
-logger.setLevel(logging.ERROR)
-
 def init_state(args: Namespace):
     nodeState.public_key_hex_str = get_pub_key_hex_str(args.nodename)
     nodeState.mode = args.mode
@@ -26,18 +30,12 @@ def init_state(args: Namespace):
     nodeState.node_port = args.port
     nodeState.start_peers = [args.peer] if args.peer else []
     nodeState.evil_mode = args.evil == "yes"
-
-
-def start_scheduler():
-    scheduler = BackgroundScheduler()
-    scheduler.add_job(
-        miner_scheduled_job,
-        'interval',
-        seconds=1,
-        max_instances=1,
-        id='data_task'
-    )
-    scheduler.start()
+    nodeState.max_block_transactions = args.max_block_txs
+    nodeState.max_block_bytes = args.max_block_bytes
+    nodeState.mempool.max_size = args.max_mempool
+    nodeState.prune_depth = args.prune
+    signatureCache.max_size = args.sig_cache_size
+    nodeState.block_store = BlockStore(os.path.join(args.datadir, args.nodename))
 
 
 def load_peers(peer_filename):
@@ -58,24 +56,68 @@ if __name__ == "__main__":
     parser.add_argument('--port', type=int, required=False, help='Port number', default=2000)
     parser.add_argument('--peer', type=str, required=False, help='Peer address')
     parser.add_argument('--evil', type=str, required=False, help='Evil mode', default='no')
+    parser.add_argument('--workers', type=int, required=False, help='Number of mining processes', default=1)
+    parser.add_argument('--max-block-txs', type=int, required=False, help='Max transactions per mined block',
+                        default=1000)
+    parser.add_argument('--max-block-bytes', type=int, required=False, help='Max serialized size of mined block',
+                        default=1000000)
+    parser.add_argument('--max-mempool', type=int, required=False, help='Max number of pending transactions',
+                        default=50000)
+    parser.add_argument('--broadcast-workers', type=int, required=False,
+                        help='Max number of concurrent requests to peers', default=16)
+    parser.add_argument('--broadcast-timeout', type=float, required=False,
+                        help='Timeout in seconds for a single request to a peer', default=5.0)
+    parser.add_argument('--verify-workers', type=int, required=False,
+                        help='Number of processes verifying block transaction signatures', default=1)
+    parser.add_argument('--sig-cache-size', type=int, required=False,
+                        help='Max number of verified transaction signatures to remember', default=100000)
+    parser.add_argument('--datadir', type=str, required=False, help='Directory for the block store', default="data")
+    parser.add_argument('--prune', type=int, required=False,
+                        help='Keep block bodies and UTXO state only for this many recent blocks (0 keeps all)',
+                        default=0)
+    parser.add_argument('--snapshot', type=str, required=False, help='UTXO snapshot to start a JOIN node from')
+    parser.add_argument('--export-snapshot', type=str, required=False,
+                        help='Write a UTXO snapshot of the stored blockchain to this file and exit')
+    parser.add_argument('--snapshot-block', type=str, required=False,
+                        help='Hash of the block to export the snapshot at, defaults to the best block')
 
     args = parser.parse_args()
+    if 0 < args.prune <= nodeState.block_abandance_height_diff:
+        parser.error(f"--prune must be greater than {nodeState.block_abandance_height_diff}")
     init_state(args)
 
+    if args.export_snapshot:
+        nodeState.load_stored_blocks()
+        write_snapshot(args.export_snapshot, nodeState.create_utxo_snapshot(args.snapshot_block))
+        logging.info(f"UTXO snapshot written to {args.export_snapshot}")
+        sys.exit(0)
+
     logging.info(f"Starting node on address {args.address}:{args.port} with mode: {args.mode}")
+    init_mining_pool(args.workers)
+    init_broadcast_engine(args.broadcast_workers, args.broadcast_timeout)
+    init_verification_pool(args.verify_workers)
+    nodeState.load_stored_blocks()
+
+    if args.mode == "JOIN" and args.snapshot and not nodeState.blockchain_blocks:
+        logging.info("Joining network from UTXO snapshot")
+        nodeState.load_utxo_snapshot(read_snapshot(args.snapshot))
+        peers = load_peers(args.peer)
+        init_handshake(peers)
+        sync_blockchain(peers)
+        threading.Thread(target=sync_snapshot_history, args=(peers,),
+                         name="snapshot-validation", daemon=True).start()
 
-    if args.mode == "JOIN":
+    elif args.mode == "JOIN":
         logging.info("Joining network")
         peers = load_peers(args.peer)
         init_handshake(peers)
-        blockchain = get_blockchain(peers[0])
-        nodeState.load_blockchain(blockchain)
+        sync_blockchain(peers)
 
-    else:
+    elif not nodeState.blockchain_blocks:
         logging.info("Initializing network, creating genesis block")
         nodeState.create_genesis_block()
 
     logging.info("Starting miner")
-    start_scheduler()
+    minerController.start()
 
     flask_app.run(host=args.address, port=args.port, use_reloader=False)
@@ -1,109 +1,248 @@
+import json
 import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Tuple
 
 import requests
+from requests.adapters import HTTPAdapter
 
 from state.block import Block
 from state.node_state import nodeState
 from state.transaction import Transaction
+from state.compact_block import CompactBlock
+from state.wire_format import WIRE_CONTENT_TYPE, decode_message, decode_compact_blocks
+
+DEFAULT_MAX_CONCURRENCY = 16
+DEFAULT_TIMEOUT_SECONDS = 5.0
+CONNECT_TIMEOUT_SECONDS = 2.0
+WIRE_ACCEPT = f"{WIRE_CONTENT_TYPE}, application/json;q=0.5"
+
+
+class PeerStats:
+
+    def __init__(self):
+        self.requests = 0
+        self.failures = 0
+        self.last_latency = 0.0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+
+    def record(self, latency: float, failed: bool):
+        self.requests += 1
+        if failed:
+            self.failures += 1
+        self.last_latency = latency
+        self.total_latency += latency
+        self.max_latency = max(self.max_latency, latency)
+
+    def to_dict(self) -> dict:
+        return {
+            "requests": self.requests,
+            "failures": self.failures,
+            "lastLatency": self.last_latency,
+            "avgLatency": self.total_latency / self.requests if self.requests else 0.0,
+            "maxLatency": self.max_latency
+        }
+
+
+class BroadcastEngine:
+
+    def __init__(self, max_concurrency: int, timeout: float):
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.sessions: Dict[str, requests.Session] = {}
+        self.peer_stats: Dict[str, PeerStats] = {}
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="broadcast")
+
+    def get_session(self, peer: str) -> requests.Session:
+        with self.lock:
+            session = self.sessions.get(peer)
+            if session is None:
+                session = requests.Session()
+                session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=self.max_concurrency))
+                self.sessions[peer] = session
+                self.peer_stats[peer] = PeerStats()
+            return session
+
+    def request(self, method: str, peer: str, path: str, timeout: float | None = None, **kwargs) -> requests.Response:
+        session = self.get_session(peer)
+        started_at = time.time()
+        try:
+            response = session.request(method, f"http://{peer}/{path.lstrip('/')}",
+                                       timeout=(CONNECT_TIMEOUT_SECONDS, timeout or self.timeout), **kwargs)
+            response.raise_for_status()
+        except requests.exceptions.RequestException:
+            self.record_latency(peer, time.time() - started_at, failed=True)
+            raise
+        self.record_latency(peer, time.time() - started_at, failed=False)
+        return response
+
+    def post_to_peers(self, peers: List[str], path: str, body: dict) -> Dict[str, Exception | None]:
+        payload = json.dumps(body)
+        futures = {peer: self.executor.submit(self.request, "POST", peer, path, data=payload,
+                                              headers={"Content-Type": "application/json"})
+                   for peer in peers}
+
+        results = {}
+        for peer, future in futures.items():
+            try:
+                future.result()
+                results[peer] = None
+            except requests.exceptions.RequestException as e:
+                results[peer] = e
+        return results
+
+    def record_latency(self, peer: str, latency: float, failed: bool):
+        with self.lock:
+            self.peer_stats[peer].record(latency, failed)
+
+    def get_stats(self) -> dict:
+        with self.lock:
+            return {peer: stats.to_dict() for peer, stats in self.peer_stats.items()}
+
+
+broadcast_engine = BroadcastEngine(DEFAULT_MAX_CONCURRENCY, DEFAULT_TIMEOUT_SECONDS)
+
+
+def init_broadcast_engine(max_concurrency: int, timeout: float):
+    global broadcast_engine
+    broadcast_engine = BroadcastEngine(max_concurrency, timeout)
+    logging.info(f"Broadcast engine started with {max_concurrency} workers and {timeout}s timeout")
+
+
+def get_broadcast_stats() -> dict:
+    return broadcast_engine.get_stats()
+
+
+def log_request_error(peer: str, error: Exception):
+    if isinstance(error, requests.exceptions.Timeout):
+        logging.warning(f"Request to {peer} timed out")
+    elif isinstance(error, requests.exceptions.ConnectionError):
+        logging.warning(f"Failed to connect to {peer}")
+    elif isinstance(error, requests.exceptions.HTTPError):
+        logging.warning(f"HTTP error occurred: {error}")
+    else:
+        logging.warning(f"An error occurred: {error}")
 
 
 def broadcast_transaction_into_network(transaction_request, address_to_skip=None):
     transaction: Transaction = transaction_request["transaction"]
+    announce_inventory([], [transaction.txId], address_to_skip)
 
-    request_to_broadcast = {
-        "transaction": transaction.model_dump(),
-        "callback": nodeState.get_callback_address()
-    }
 
-    send_to_all_peers(request_to_broadcast, address_to_skip, endpoint="/broadcastTransaction", content=transaction)
+def broadcast_transactions_into_network(transactions: List[Transaction], address_to_skip=None):
+    announce_inventory([], [transaction.txId for transaction in transactions], address_to_skip)
 
 
 def broadcast_block_into_network(block: Block, callback_address, address_to_skip=None):
+    announce_inventory([block.hash], [], address_to_skip, callback_address)
+
+
+def announce_inventory(block_hashes: List[str], tx_ids: List[str], address_to_skip=None, callback_address=None):
+    for block_hash in block_hashes:
+        nodeState.seen_blocks.add(block_hash)
+    for tx_id in tx_ids:
+        nodeState.seen_transactions.add(tx_id)
+
     request_to_broadcast = {
-        "block": block.model_dump(),
-        "callback": callback_address
+        "blocks": block_hashes,
+        "transactions": tx_ids,
+        "callback": callback_address or nodeState.get_callback_address()
     }
+    send_to_all_peers(request_to_broadcast, address_to_skip, endpoint="inv",
+                      content=f"{len(block_hashes)} blocks and {len(tx_ids)} transactions")
+
 
-    send_to_all_peers(request_to_broadcast, address_to_skip, endpoint="blockBroadcast", content=block)
+def decode_data_response(response: requests.Response) -> Tuple[List[Block], List[Transaction]]:
+    if response.headers.get("Content-Type", "").startswith(WIRE_CONTENT_TYPE):
+        return decode_message(response.content)
+
+    data = response.json()
+    if isinstance(data, list):
+        return [Block(**block) for block in data], []
+    return [Block(**block) for block in data["blocks"]], [Transaction(**transaction) for transaction in data["transactions"]]
+
+
+def request_inventory_data(node_address, block_hashes: List[str],
+                           tx_ids: List[str]) -> Tuple[List[Block], List[Transaction]] | None:
+    try:
+        response = broadcast_engine.request("POST", node_address, "getData", headers={"Accept": WIRE_ACCEPT},
+                                            json={"blocks": block_hashes, "transactions": tx_ids})
+        return decode_data_response(response)
+    except (requests.exceptions.RequestException, ValueError) as e:
+        log_request_error(node_address, e)
+    return None
+
+
+def request_compact_blocks(node_address, block_hashes: List[str]) -> List[CompactBlock] | None:
+    try:
+        response = broadcast_engine.request("POST", node_address, "compactBlocks", headers={"Accept": WIRE_ACCEPT},
+                                            json={"blocks": block_hashes})
+        if response.headers.get("Content-Type", "").startswith(WIRE_CONTENT_TYPE):
+            return decode_compact_blocks(response.content)
+        return [CompactBlock(**compact_block) for compact_block in response.json()]
+    except (requests.exceptions.RequestException, ValueError) as e:
+        log_request_error(node_address, e)
+    return None
+
+
+def request_block_transactions(node_address, block_hash: str, indexes: List[int]) -> List[Transaction] | None:
+    try:
+        response = broadcast_engine.request("POST", node_address, "blockTransactions", headers={"Accept": WIRE_ACCEPT},
+                                            json={"hash": block_hash, "indexes": indexes})
+        return decode_data_response(response)[1]
+    except (requests.exceptions.RequestException, ValueError) as e:
+        log_request_error(node_address, e)
+    return None
 
 
 def init_handshake(peers):
-    for peer in peers:
-        logging.info(f"Initiating handshake with peer: {peer}")
-        logging.info(f"http://{peer}/handshake")
-        try:
-            response = requests.post(f"http://{peer}/handshake",
-                                     json={"callback": f"{nodeState.node_address}:{nodeState.node_port}"})
-            response.raise_for_status()
-        except requests.exceptions.Timeout:
-            logging.warn("Request timed out")
-        except requests.exceptions.ConnectionError:
-            logging.warn("Failed to connect to the server")
-        except requests.exceptions.HTTPError as http_err:
-            logging.warn(f"HTTP error occurred: {http_err}")
-        except requests.exceptions.RequestException as err:
-            logging.warn(f"An error occurred: {err}")
+    logging.info(f"Initiating handshake with peers: {peers}")
+    results = broadcast_engine.post_to_peers(peers, "handshake", {"callback": nodeState.get_callback_address()})
+    for peer, error in results.items():
+        if error is not None:
+            log_request_error(peer, error)
         nodeState.add_peer(peer)
         logging.info(f"Handshake complete with peer: {peer}")
 
 
 def send_to_all_peers(request_body, address_to_skip, endpoint, content=""):
-    to_remove = []
     logging.debug(f"Broadcasting message/block: {content} to all peers")
-    for peer in nodeState.connected_peers:
-        logging.debug(f"Peer: {peer}")
-        if peer == address_to_skip:
+    peers = [peer for peer in nodeState.connected_peers if peer != address_to_skip]
+    results = broadcast_engine.post_to_peers(peers, endpoint, request_body)
+
+    for peer, error in results.items():
+        if error is None:
             continue
-        try:
-            logging.debug(f"Broadcasting message/block to peer: {peer}")
-            response = requests.post(f"http://{peer}/{endpoint}", json=request_body,
-                                     )
-            response.raise_for_status()
-        except requests.exceptions.Timeout:
-            logging.warn("Request timed out")
-            to_remove.append(peer)
-        except requests.exceptions.ConnectionError:
-            logging.warn("Failed to connect to the server")
-            to_remove.append(peer)
-        except requests.exceptions.HTTPError as http_err:
-            logging.warn(f"HTTP error occurred: {http_err}")
-            to_remove.append(peer)
-        except requests.exceptions.RequestException as err:
-            logging.warn(f"An error occurred: {err}")
-            to_remove.append(peer)
-
-    for peer in to_remove:
+        log_request_error(peer, error)
         nodeState.remove_peer(peer)
-        logging.warn(f"Removed peer: {peer}, connected peers: {len(nodeState.connected_peers)}")
+        logging.warning(f"Removed peer: {peer}, connected peers: {len(nodeState.connected_peers)}")
 
 
 def get_block(node_address, index):
+    blocks = get_blocks(node_address, index, 1)
+    if not blocks:
+        return None
+    return blocks[0]
+
+
+def get_headers(node_address, from_height: int, count: int) -> List[dict] | None:
     try:
-        response = requests.get(f"http://{node_address}/block?index={index}")
-        response.raise_for_status()
-        return response.json()
-    except requests.exceptions.Timeout:
-        logging.warn("Request timed out")
-    except requests.exceptions.ConnectionError:
-        logging.warn("Failed to connect to the server")
-    except requests.exceptions.HTTPError as http_err:
-        logging.warn(f"HTTP error occurred: {http_err}")
-    except requests.exceptions.RequestException as err:
-        logging.warn(f"An error occurred: {err}")
+        return broadcast_engine.request("GET", node_address, "headers",
+                                        params={"from": from_height, "count": count}).json()
+    except (requests.exceptions.RequestException, ValueError) as e:
+        log_request_error(node_address, e)
     return None
 
 
-def get_blockchain(node_address):
+def get_blocks(node_address, from_height: int, count: int) -> List[Block] | None:
     try:
-        response = requests.get(f"http://{node_address}/allBlocks")
-        response.raise_for_status()
-        return response.json()
-    except requests.exceptions.Timeout:
-        logging.warn("Request timed out")
-    except requests.exceptions.ConnectionError:
-        logging.warn("Failed to connect to the server")
-    except requests.exceptions.HTTPError as http_err:
-        logging.warn(f"HTTP error occurred: {http_err}")
-    except requests.exceptions.RequestException as err:
-        logging.warn(f"An error occurred: {err}")
+        response = broadcast_engine.request("GET", node_address, "blocks", headers={"Accept": WIRE_ACCEPT},
+                                            params={"from": from_height, "count": count})
+        return decode_data_response(response)[0]
+    except (requests.exceptions.RequestException, ValueError) as e:
+        log_request_error(node_address, e)
     return None
@@ -0,0 +1,136 @@
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, List
+
+from client.broadcast import get_blocks, get_headers
+from state.block import Block
+from state.block_data import BlockData
+from state.node_state import nodeState
+
+HEADERS_BATCH_SIZE = 2000
+BLOCKS_BATCH_SIZE = 100
+DOWNLOADS_PER_PEER = 2
+
+
+def is_header_valid(header: dict, previous_header: dict | None) -> bool:
+    if previous_header is not None and (header["data"]["previous_hash"] != previous_header["hash"] or
+                                        header["data"]["index"] != previous_header["data"]["index"] + 1):
+        return False
+    block = Block(hash=header["hash"], data=BlockData(**header["data"], transactions=[]))
+    return block.is_hash_valid()
+
+
+def is_block_body_valid(block: Block) -> bool:
+    return block.is_hash_valid() and block.data.is_merkle_root_valid()
+
+
+def download_headers(peer: str, from_height: int, to_height: int | None = None) -> List[dict] | None:
+    headers = []
+    while to_height is None or from_height + len(headers) <= to_height:
+        count = HEADERS_BATCH_SIZE
+        if to_height is not None:
+            count = min(count, to_height - from_height - len(headers) + 1)
+        batch = get_headers(peer, from_height + len(headers), count)
+        if batch is None:
+            return None
+
+        for header in batch:
+            if not is_header_valid(header, headers[-1] if headers else None):
+                logging.warning(f"Peer {peer} sent an invalid header at height {header['data']['index']}")
+                return None
+            headers.append(header)
+
+        if len(batch) < count:
+            break
+    return headers
+
+
+def find_sync_start(peer: str) -> int | None:
+    best_height = nodeState.get_best_height()
+    if best_height < 0:
+        return 0
+
+    margin = nodeState.block_abandance_height_diff
+    while True:
+        from_height = max(0, best_height - margin)
+        headers = get_headers(peer, from_height, 1)
+        if headers is None:
+            return None
+        if not headers or from_height == 0 or headers[0]["data"]["previous_hash"] in nodeState.blockchain_blocks:
+            return from_height
+        margin *= 2
+
+
+def download_block_range(peers: List[str], range_index: int, headers: List[dict]) -> List[Block] | None:
+    from_height = headers[0]["data"]["index"]
+    expected_hashes = [header["hash"] for header in headers]
+    for attempt in range(len(peers)):
+        peer = peers[(range_index + attempt) % len(peers)]
+        blocks = get_blocks(peer, from_height, len(headers))
+        if blocks is not None and [block.hash for block in blocks] == expected_hashes and \
+                all(is_block_body_valid(block) for block in blocks):
+            return blocks
+        logging.warning(f"Peer {peer} did not serve valid blocks {from_height}-{from_height + len(headers) - 1}")
+    return None
+
+
+def download_blocks(peers: List[str], headers: List[dict]) -> Iterator[Block]:
+    ranges = [headers[i:i + BLOCKS_BATCH_SIZE] for i in range(0, len(headers), BLOCKS_BATCH_SIZE)]
+    window_size = len(peers) * DOWNLOADS_PER_PEER
+    with ThreadPoolExecutor(max_workers=window_size, thread_name_prefix="sync") as executor:
+        pending = deque()
+        next_range = 0
+        while pending or next_range < len(ranges):
+            while next_range < len(ranges) and len(pending) < window_size:
+                pending.append(executor.submit(download_block_range, peers, next_range, ranges[next_range]))
+                next_range += 1
+
+            blocks = pending.popleft().result()
+            if blocks is None:
+                for future in pending:
+                    future.cancel()
+                raise ValueError("Failed to download blocks from any peer")
+            yield from blocks
+
+
+def sync_blockchain(peers: List[str]) -> int:
+    for peer in peers:
+        from_height = find_sync_start(peer)
+        if from_height is None:
+            continue
+        headers = download_headers(peer, from_height)
+        if headers is None:
+            continue
+        headers = [header for header in headers if header["hash"] not in nodeState.blockchain_blocks]
+        logging.info(f"Syncing {len(headers)} blocks from height {from_height} using headers from {peer}")
+
+        synced_blocks = 0
+        try:
+            for block in download_blocks(peers, headers):
+                nodeState.append_block(block)
+                synced_blocks += 1
+        except ValueError as e:
+            logging.error(f"Blockchain sync stopped after {synced_blocks} blocks: {e}")
+        logging.info(f"Synced {synced_blocks} blocks, best height is {nodeState.get_best_height()}")
+        return synced_blocks
+
+    logging.error("Could not download headers from any peer")
+    return 0
+
+
+def sync_snapshot_history(peers: List[str]) -> bool:
+    snapshot_height = nodeState.blockchain_blocks[nodeState.snapshot_block_hash].data.index
+    for peer in peers:
+        headers = download_headers(peer, 0, snapshot_height)
+        if headers is None:
+            continue
+        try:
+            history = list(download_blocks(peers, headers))
+        except ValueError as e:
+            logging.error(f"Failed to download blockchain history: {e}")
+            return False
+        return nodeState.validate_snapshot_history(history)
+
+    logging.error("Could not download blockchain history from any peer")
+    return False
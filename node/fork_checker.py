@@ -9,7 +9,7 @@ chains = []
 for i, port in enumerate(ports):
     url = f"http://localhost:{port}/allBlocks"
     response = requests.request("GET", url, verify=False)
-    body = response.json()
+    body = [json.loads(line) for line in response.text.splitlines() if line]
     chains.append(body)
 
 min_chain_length = min([len(chain) for chain in chains])
@@ -0,0 +1,48 @@
+from typing import Dict
+
+from state.utxo import Utxo, addressTable
+from state.utxo_set import UtxoSet
+
+
+class AddressIndex:
+
+    def __init__(self):
+        self.address_outpoints: Dict[int, Dict[bytes, Utxo]] = {}
+        self.tip_hash: str | None = None
+
+    def add_outpoint(self, key: bytes, utxo: Utxo):
+        self.address_outpoints.setdefault(utxo.address_id, {})[key] = utxo
+
+    def remove_outpoint(self, key: bytes, utxo: Utxo):
+        outpoints = self.address_outpoints.get(utxo.address_id)
+        if outpoints is None:
+            return
+        outpoints.pop(key, None)
+        if not outpoints:
+            del self.address_outpoints[utxo.address_id]
+
+    def rebuild(self, utxos: UtxoSet, tip_hash: str):
+        self.address_outpoints = {}
+        for key, utxo in utxos.items():
+            self.add_outpoint(key, utxo)
+        self.tip_hash = tip_hash
+
+    def connect_block(self, utxos: UtxoSet, block_hash: str):
+        for key, utxo in utxos.spent.items():
+            self.remove_outpoint(key, utxo)
+        for key, utxo in utxos.created.items():
+            self.add_outpoint(key, utxo)
+        self.tip_hash = block_hash
+
+    def disconnect_block(self, utxos: UtxoSet, parent_hash: str):
+        for key, utxo in utxos.created.items():
+            self.remove_outpoint(key, utxo)
+        for key, utxo in utxos.spent.items():
+            self.add_outpoint(key, utxo)
+        self.tip_hash = parent_hash
+
+    def get_outpoints(self, address: str) -> Dict[bytes, Utxo]:
+        address_id = addressTable.find_id(address)
+        if address_id is None:
+            return {}
+        return self.address_outpoints.get(address_id, {})
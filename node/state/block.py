@@ -6,9 +6,20 @@ from pydantic import BaseModel, PrivateAttr
 from state.block_data import BlockData
 from state.transaction import Transaction
 
+
+def get_difficulty_target(difficulty: int) -> int:
+    return 1 << max(256 - difficulty, 0)
+
+
 class BlockMetadata:
-    children_hashes: List[str] = []
-    unspent_transaction_outputs = {}
+
+    def __init__(self):
+        self.parent: 'Block | None' = None
+        self.skip: 'Block | None' = None
+        self.height = 0
+        self.children_hashes: List[str] = []
+        self.unspent_transaction_outputs = {}
+        self.chain_work = 0
 
 class Block(BaseModel):
     hash: str
@@ -23,8 +34,10 @@ class Block(BaseModel):
         return self.hash
 
     def is_hash_valid(self) -> bool:
-        hash_binary = bin(int(self.hash, 16))[2:].zfill(256)
-        return self.hash == self.calculate_hash() and hash_binary.startswith("0" * self.data.difficulty)
+        return self.hash == self.calculate_hash() and int(self.hash, 16) < get_difficulty_target(self.data.difficulty)
+
+    def get_work(self) -> int:
+        return 1 << self.data.difficulty
 
     def is_genesis_block(self) -> bool:
         return self.data.index == 0 and self.data.previous_hash == "0"
@@ -33,5 +46,6 @@ class Block(BaseModel):
     def genesis_block(coinbase_transaction: Transaction, difficulty: int) -> 'Block':
         genesis_data = BlockData(index=0, previous_hash="0", difficulty=difficulty, timestamp=time.time(), nonce=0,
                                  transactions=[coinbase_transaction])
+        genesis_data.update_merkle_root()
 
         return Block(hash=genesis_data.calculate_hash(), data=genesis_data)
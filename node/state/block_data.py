@@ -3,6 +3,7 @@ from typing import List
 import hashlib
 
 from state.transaction import Transaction
+from utils.merkle import calculate_merkle_root
 
 
 class BlockData(BaseModel):
@@ -11,7 +12,29 @@ class BlockData(BaseModel):
     difficulty: int
     timestamp: float
     nonce: int
+    merkle_root: str = ""
     transactions: List[Transaction]
 
+    def get_header_json(self) -> str:
+        return self.model_dump_json(exclude={"transactions"})
+
     def calculate_hash(self):
-        return hashlib.sha256(self.model_dump_json().encode()).hexdigest()
+        return hashlib.sha256(self.get_header_json().encode()).hexdigest()
+
+    def calculate_merkle_root(self) -> str:
+        return calculate_merkle_root([transaction.txId for transaction in self.transactions])
+
+    def has_duplicate_transactions(self) -> bool:
+        return len({transaction.txId for transaction in self.transactions}) != len(self.transactions)
+
+    def is_merkle_root_valid(self) -> bool:
+        return not self.has_duplicate_transactions() and self.merkle_root == self.calculate_merkle_root()
+
+    def update_merkle_root(self):
+        self.merkle_root = self.calculate_merkle_root()
+
+    def get_nonce_template(self) -> tuple[bytes, bytes]:
+        serialized = self.get_header_json().encode()
+        nonce_start = serialized.index(b'"nonce":') + len(b'"nonce":')
+        nonce_end = serialized.index(b",", nonce_start)
+        return serialized[:nonce_start], serialized[nonce_end:]
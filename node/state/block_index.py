@@ -0,0 +1,62 @@
+from state.block import Block
+
+
+def invert_lowest_one(n: int) -> int:
+    return n & (n - 1)
+
+
+def get_skip_height(height: int) -> int:
+    if height < 2:
+        return 0
+    if height & 1:
+        return invert_lowest_one(invert_lowest_one(height - 1)) + 1
+    return invert_lowest_one(height)
+
+
+def link_block(block: Block, parent_block: Block | None):
+    metadata = block.get_metadata()
+    metadata.height = block.data.index
+    metadata.parent = parent_block
+    if parent_block is None:
+        return
+
+    metadata.skip = get_ancestor(parent_block, get_skip_height(metadata.height))
+    parent_block.get_metadata().children_hashes.append(block.hash)
+
+
+def get_ancestor(block: Block, height: int) -> Block | None:
+    if height < 0 or height > block.get_metadata().height:
+        return None
+
+    walk = block
+    walk_height = walk.get_metadata().height
+    while walk is not None and walk_height > height:
+        skip_height = get_skip_height(walk_height)
+        previous_skip_height = get_skip_height(walk_height - 1)
+        skip = walk.get_metadata().skip
+        if skip is not None and (skip_height == height or (skip_height > height and not (
+                previous_skip_height < skip_height - 2 and previous_skip_height >= height))):
+            walk = skip
+            walk_height = skip_height
+        else:
+            walk = walk.get_metadata().parent
+            walk_height -= 1
+    return walk
+
+
+def find_fork_point(first_block: Block, second_block: Block) -> Block | None:
+    first_height = first_block.get_metadata().height
+    second_height = second_block.get_metadata().height
+    if first_height > second_height:
+        first_block = get_ancestor(first_block, second_height)
+    elif second_height > first_height:
+        second_block = get_ancestor(second_block, first_height)
+
+    while first_block is not None and second_block is not None and first_block.hash != second_block.hash:
+        first_skip = first_block.get_metadata().skip
+        second_skip = second_block.get_metadata().skip
+        if first_skip is not None and second_skip is not None and first_skip.hash != second_skip.hash:
+            first_block, second_block = first_skip, second_skip
+        else:
+            first_block, second_block = first_block.get_metadata().parent, second_block.get_metadata().parent
+    return first_block
@@ -0,0 +1,107 @@
+import logging
+import os
+import struct
+import threading
+from typing import Dict, NamedTuple
+
+from state.block import Block
+
+RECORD_LENGTH = struct.Struct(">I")
+INDEX_RECORD = struct.Struct(">32sQQI")
+EVICTED_OFFSET = 2 ** 64 - 1
+
+
+class BlockStoreEntry(NamedTuple):
+    hash: str
+    height: int
+    offset: int
+    length: int
+
+
+class BlockStore:
+
+    def __init__(self, directory: str):
+        os.makedirs(directory, exist_ok=True)
+        self.blocks_path = os.path.join(directory, "blocks.dat")
+        self.index_path = os.path.join(directory, "blocks.idx")
+        self.entries: Dict[str, BlockStoreEntry] = {}
+        self.lock = threading.Lock()
+
+        self.load_index()
+        self.blocks_file = open(self.blocks_path, "ab")
+        self.index_file = open(self.index_path, "ab")
+        self.reader = open(self.blocks_path, "rb")
+
+    def load_index(self):
+        if not os.path.exists(self.index_path) or not os.path.exists(self.blocks_path):
+            open(self.index_path, "wb").close()
+            return
+
+        blocks_file_size = os.path.getsize(self.blocks_path)
+        with open(self.index_path, "rb") as index_file:
+            index_data = index_file.read()
+
+        valid_index_size = 0
+        for position in range(0, len(index_data) - INDEX_RECORD.size + 1, INDEX_RECORD.size):
+            raw_hash, height, offset, length = INDEX_RECORD.unpack_from(index_data, position)
+            if offset == EVICTED_OFFSET:
+                self.entries.pop(raw_hash.hex(), None)
+                valid_index_size = position + INDEX_RECORD.size
+                continue
+            if offset + RECORD_LENGTH.size + length > blocks_file_size:
+                logging.warning("Block store index points past the end of the block file, ignoring the rest")
+                break
+            self.entries[raw_hash.hex()] = BlockStoreEntry(raw_hash.hex(), height, offset, length)
+            valid_index_size = position + INDEX_RECORD.size
+
+        if valid_index_size != len(index_data):
+            with open(self.index_path, "r+b") as index_file:
+                index_file.truncate(valid_index_size)
+        logging.info(f"Block store loaded {len(self.entries)} blocks from {self.blocks_path}")
+
+    def __contains__(self, block_hash: str) -> bool:
+        return block_hash in self.entries
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def append(self, block: Block):
+        if block.hash in self.entries:
+            return
+
+        serialized = block.model_dump_json().encode()
+        with self.lock:
+            offset = self.blocks_file.tell()
+            self.blocks_file.write(RECORD_LENGTH.pack(len(serialized)))
+            self.blocks_file.write(serialized)
+            self.blocks_file.flush()
+
+            entry = BlockStoreEntry(block.hash, block.data.index, offset, len(serialized))
+            self.index_file.write(INDEX_RECORD.pack(bytes.fromhex(block.hash), entry.height, entry.offset, entry.length))
+            self.index_file.flush()
+            self.entries[block.hash] = entry
+
+    def evict(self, block_hash: str):
+        with self.lock:
+            entry = self.entries.pop(block_hash, None)
+            if entry is None:
+                return
+            self.index_file.write(INDEX_RECORD.pack(bytes.fromhex(block_hash), entry.height, EVICTED_OFFSET, 0))
+            self.index_file.flush()
+
+    def read_raw(self, block_hash: str) -> bytes | None:
+        entry = self.entries.get(block_hash)
+        if entry is None:
+            return None
+        with self.lock:
+            self.reader.seek(entry.offset + RECORD_LENGTH.size)
+            return self.reader.read(entry.length)
+
+    def load_blocks(self):
+        for entry in sorted(self.entries.values(), key=lambda x: x.offset):
+            yield Block.model_validate_json(self.read_raw(entry.hash))
+
+    def close(self):
+        self.blocks_file.close()
+        self.index_file.close()
+        self.reader.close()
@@ -0,0 +1,74 @@
+import hashlib
+from typing import Iterable, List, Tuple
+
+from pydantic import BaseModel
+
+from state.block import Block
+from state.block_data import BlockData
+from state.transaction import Transaction
+
+SHORT_ID_BYTES = 6
+BLAKE2B_MAX_KEY_BYTES = 64
+
+
+class PrefilledTransaction(BaseModel):
+    index: int
+    transaction: Transaction
+
+
+class CompactBlock(BaseModel):
+    hash: str
+    data: BlockData
+    shortIds: List[str]
+    prefilled: List[PrefilledTransaction]
+
+    def get_transaction_count(self) -> int:
+        return len(self.shortIds) + len(self.prefilled)
+
+
+def get_short_id(block_hash: str, tx_id: str) -> str:
+    key = block_hash.encode()[:BLAKE2B_MAX_KEY_BYTES]
+    return hashlib.blake2b(tx_id.encode(), digest_size=SHORT_ID_BYTES, key=key).hexdigest()
+
+
+def create_compact_block(block: Block) -> CompactBlock:
+    return CompactBlock(
+        hash=block.hash,
+        data=block.data.model_copy(update={"transactions": []}),
+        shortIds=[get_short_id(block.hash, transaction.txId) for transaction in block.data.transactions[1:]],
+        prefilled=[PrefilledTransaction(index=0, transaction=block.data.transactions[0])]
+    )
+
+
+def match_compact_block(compact_block: CompactBlock,
+                        transactions: Iterable[Transaction]) -> Tuple[List[Transaction | None], List[int]]:
+    slots: List[Transaction | None] = [None] * compact_block.get_transaction_count()
+    for prefilled in compact_block.prefilled:
+        if not 0 <= prefilled.index < len(slots):
+            raise ValueError(f"Prefilled transaction index {prefilled.index} is out of range")
+        slots[prefilled.index] = prefilled.transaction
+
+    short_id_indexes = {}
+    free_indexes = [index for index, transaction in enumerate(slots) if transaction is None]
+    for index, short_id in zip(free_indexes, compact_block.shortIds):
+        short_id_indexes[short_id] = index
+
+    for transaction in transactions:
+        index = short_id_indexes.get(get_short_id(compact_block.hash, transaction.txId))
+        if index is not None:
+            slots[index] = transaction
+
+    return slots, [index for index, transaction in enumerate(slots) if transaction is None]
+
+
+def fill_compact_block(compact_block: CompactBlock, slots: List[Transaction | None], missing_indexes: List[int],
+                       missing_transactions: List[Transaction]) -> Block | None:
+    if len(missing_indexes) != len(missing_transactions):
+        return None
+    for index, transaction in zip(missing_indexes, missing_transactions):
+        slots[index] = transaction
+
+    block = Block(hash=compact_block.hash, data=compact_block.data.model_copy(update={"transactions": slots}))
+    if not block.data.is_merkle_root_valid():
+        return None
+    return block
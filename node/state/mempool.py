@@ -0,0 +1,98 @@
+import logging
+from typing import Dict, List
+
+from state.block import Block
+from state.transaction import Transaction
+from state.utxo import get_outpoint_key
+
+
+class Mempool:
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self.transactions: Dict[str, Transaction] = {}
+        self.transaction_sizes: Dict[str, int] = {}
+        self.outpoints: Dict[bytes, str] = {}
+
+    def __len__(self) -> int:
+        return len(self.transactions)
+
+    def __iter__(self):
+        return iter(list(self.transactions.values()))
+
+    def __contains__(self, tx_id: str) -> bool:
+        return tx_id in self.transactions
+
+    def get(self, tx_id: str) -> Transaction | None:
+        return self.transactions.get(tx_id)
+
+    def get_conflicting_tx_id(self, transaction: Transaction) -> str | None:
+        for txIn in transaction.data.txIns:
+            try:
+                tx_id = self.outpoints.get(get_outpoint_key(txIn.txOutId, txIn.txOutIndex))
+            except ValueError:
+                continue
+            if tx_id is not None:
+                return tx_id
+        return None
+
+    def add(self, transaction: Transaction) -> List[Transaction]:
+        self.transactions[transaction.txId] = transaction
+        self.transaction_sizes[transaction.txId] = len(transaction.model_dump_json())
+        for txIn in transaction.data.txIns:
+            self.outpoints[get_outpoint_key(txIn.txOutId, txIn.txOutIndex)] = transaction.txId
+
+        evicted = []
+        while len(self.transactions) > self.max_size:
+            oldest_tx_id = next(iter(self.transactions))
+            evicted.append(self.remove(oldest_tx_id))
+            logging.info(f"Mempool full, evicted transaction {oldest_tx_id}")
+        return evicted
+
+    def remove(self, tx_id: str) -> Transaction | None:
+        transaction = self.transactions.pop(tx_id, None)
+        if transaction is None:
+            return None
+
+        del self.transaction_sizes[tx_id]
+        for txIn in transaction.data.txIns:
+            key = get_outpoint_key(txIn.txOutId, txIn.txOutIndex)
+            if self.outpoints.get(key) == tx_id:
+                del self.outpoints[key]
+        return transaction
+
+    def remove_for_block(self, block: Block) -> List[Transaction]:
+        removed = []
+        # The coinbase spends no outpoint, its "0" txOutId is not a valid outpoint key
+        for transaction in block.data.transactions[1:]:
+            removed_transaction = self.remove(transaction.txId)
+            if removed_transaction is not None:
+                removed.append(removed_transaction)
+
+            for txIn in transaction.data.txIns:
+                conflicting_tx_id = self.outpoints.get(get_outpoint_key(txIn.txOutId, txIn.txOutIndex))
+                if conflicting_tx_id is not None:
+                    logging.info(f"Transaction {conflicting_tx_id} conflicts with block {block.data.index}")
+                    removed.append(self.remove(conflicting_tx_id))
+        return removed
+
+    def revalidate(self, unspent_transaction_outputs) -> List[Transaction]:
+        invalid_transactions = [transaction for transaction in self.transactions.values() if not all(
+            get_outpoint_key(txIn.txOutId, txIn.txOutIndex) in unspent_transaction_outputs
+            for txIn in transaction.data.txIns)]
+        for transaction in invalid_transactions:
+            self.remove(transaction.txId)
+        return invalid_transactions
+
+    def select_transactions(self, max_transactions: int, max_bytes: int) -> List[Transaction]:
+        selected = []
+        used_bytes = 0
+        for tx_id, transaction in self.transactions.items():
+            if len(selected) >= max_transactions:
+                break
+            size = self.transaction_sizes[tx_id]
+            if used_bytes + size > max_bytes:
+                continue
+            selected.append(transaction)
+            used_bytes += size
+        return selected
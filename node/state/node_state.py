@@ -1,11 +1,34 @@
 import logging
+import threading
+import time
+from functools import wraps
 from math import log2
-from typing import List, Dict
+from typing import List, Dict, Tuple
 
+from state.address_index import AddressIndex
 from state.block import Block
+from state.block_index import link_block, get_ancestor, find_fork_point
+from state.block_store import BlockStore
+from state.compact_block import CompactBlock, create_compact_block, match_compact_block
+from state.mempool import Mempool
+from state.seen_set import AnnouncerTable, SeenSet
 from state.transaction import Transaction, create_coinbase
+from state.utxo import Utxo, get_outpoint_key, split_outpoint_key
+from state.utxo_set import UtxoSet
+from state.utxo_snapshot import create_snapshot, deserialize_utxos, serialize_utxos, calculate_snapshot_hash
+from utils.merkle import get_merkle_branch
 from utils.mining import mine_block
-from validation.validation import validate_block, validate_transaction
+from validation.validation import validate_block, validate_transaction, validate_transaction_inputs, \
+    verify_transaction_signatures
+
+
+def synchronized(method):
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self.lock:
+            return method(self, *args, **kwargs)
+
+    return wrapper
 
 
 class NodeState:
@@ -16,31 +39,112 @@ class NodeState:
         self.connected_peers = []
         self.blockchain_blocks: Dict[str, Block] = {}
         self.blockchain_leaf_blocks: Dict[str, Block] = {}
+        self.best_block: Block | None = None
+        self.block_store: BlockStore | None = None
+        self.snapshot_block_hash: str | None = None
+        self.snapshot_content_hash: str | None = None
+        self.transaction_block_hashes: Dict[str, List[str]] = {}
+        self.address_index = AddressIndex()
         self.public_key_hex_str: str | None = None
         self.node_address = None
         self.node_port = None
-        self.mempool: List[Transaction] = []
-        self.mempool_tx_ins = {}
+        self.mempool = Mempool(max_size=50000)
+        self.mempool_base_hash: str | None = None
+        self.seen_blocks = SeenSet(max_size=10000)
+        self.seen_transactions = SeenSet(max_size=100000)
+        self.block_announcers = AnnouncerTable(max_size=10000)
+        self.transaction_announcers = AnnouncerTable(max_size=100000)
+        self.max_block_transactions = 1000
+        self.max_block_bytes = 1000000
         self.block_abandance_height_diff = 5
         self.starting_difficulty = 10
         self.coinbase_amount = 1000
         self.is_mining = True
         self.is_mining_container = {"value": True}
+        self.new_work_event = threading.Event()
+        self.new_work_requested_at = None
+        self.lock = threading.RLock()
         self.difficulty_update_interval = 50
+        self.utxo_checkpoint_interval = 16
+        self.prune_depth = 0
+        self.pruned_height = -1
+        self.blockchain_version = 0
         self.target_block_time_seconds = 10
         self.evil_mode = False
         self.evil_mining_last_block = None
 
+    @synchronized
     def get_address_utxos(self, address: str):
+        self.update_address_index()
         utxos = []
-        for key, value in self.get_next_mining_base_block().get_metadata().unspent_transaction_outputs.items():
-            if value.address == address:
-                utxos.append({"txOutId": key.split(":")[0],
-                              "txOutIndex": key.split(":")[1],
-                              "amount": value.amount})
+        for key, value in self.address_index.get_outpoints(address).items():
+            tx_out_id, tx_out_index = split_outpoint_key(key)
+            utxos.append({"txOutId": tx_out_id,
+                          "txOutIndex": str(tx_out_index),
+                          "amount": value.amount})
 
         return utxos
 
+    def update_address_index(self):
+        next_mining_base_block = self.get_next_mining_base_block()
+        if self.address_index.tip_hash == next_mining_base_block.hash:
+            return
+
+        if self.address_index.tip_hash not in self.blockchain_blocks:
+            self.address_index.rebuild(next_mining_base_block.get_metadata().unspent_transaction_outputs,
+                                       next_mining_base_block.hash)
+            return
+
+        old_tip = self.blockchain_blocks[self.address_index.tip_hash]
+        fork_point = find_fork_point(old_tip, next_mining_base_block)
+
+        block = old_tip
+        while block.hash != fork_point.hash:
+            self.address_index.disconnect_block(block.get_metadata().unspent_transaction_outputs,
+                                                block.data.previous_hash)
+            block = block.get_metadata().parent
+
+        connected_blocks = []
+        block = next_mining_base_block
+        while block.hash != fork_point.hash:
+            connected_blocks.append(block)
+            block = block.get_metadata().parent
+        for block in reversed(connected_blocks):
+            self.address_index.connect_block(block.get_metadata().unspent_transaction_outputs, block.hash)
+
+    @synchronized
+    def get_transaction_proof(self, tx_id: str):
+        next_mining_base_block = self.get_next_mining_base_block()
+        for block_hash in self.transaction_block_hashes.get(tx_id, []):
+            block = self.blockchain_blocks[block_hash]
+            if not self.is_in_main_chain(block):
+                continue
+
+            tx_ids = [transaction.txId for transaction in block.data.transactions]
+            tx_index = tx_ids.index(tx_id)
+            return {
+                "txId": tx_id,
+                "txIndex": tx_index,
+                "blockHash": block.hash,
+                "header": block.data.model_dump(exclude={"transactions"}),
+                "branch": get_merkle_branch(tx_ids, tx_index),
+                "confirmations": next_mining_base_block.data.index - block.data.index + 1
+            }
+
+        return None
+
+    def index_block_transactions(self, block: Block):
+        for transaction in block.data.transactions:
+            self.transaction_block_hashes.setdefault(transaction.txId, []).append(block.hash)
+
+    def unindex_block_transactions(self, block: Block):
+        for transaction in block.data.transactions:
+            block_hashes = self.transaction_block_hashes.get(transaction.txId, [])
+            if block.hash in block_hashes:
+                block_hashes.remove(block.hash)
+            if not block_hashes:
+                self.transaction_block_hashes.pop(transaction.txId, None)
+
     def process_stale_blocks(self):
         next_mining_base_block = self.get_next_mining_base_block()
         for block_hash in list(self.blockchain_leaf_blocks.keys()):
@@ -53,17 +157,13 @@ class NodeState:
 
     def process_stale_block(self, stale_block: Block, next_mining_base_block: Block):
         logging.info(f"Processing stale block#{stale_block.data.index}: {stale_block.hash}")
-        block_parallel_to_stale_block = self.get_block_nth_ancestor(next_mining_base_block,
-                                                                    next_mining_base_block.data.index - stale_block.data.index)
-        stale_branch_block = stale_block
-        main_branch_block = block_parallel_to_stale_block
+        fork_point = find_fork_point(stale_block, next_mining_base_block)
 
         stale_non_coinbase_transactions = []
-
-        while stale_branch_block.data.previous_hash != main_branch_block.data.previous_hash:
-            stale_branch_block = self.blockchain_blocks[stale_branch_block.data.previous_hash]
-            main_branch_block = self.blockchain_blocks[main_branch_block.data.previous_hash]
-            stale_non_coinbase_transactions += stale_branch_block.data.transactions[1:]
+        stale_branch_block = stale_block
+        while stale_branch_block is not None and stale_branch_block is not fork_point:
+            stale_non_coinbase_transactions = stale_branch_block.data.transactions[1:] + stale_non_coinbase_transactions
+            stale_branch_block = stale_branch_block.get_metadata().parent
 
         for transaction in stale_non_coinbase_transactions:
             try:
@@ -77,22 +177,119 @@ class NodeState:
         except KeyError:
             pass
 
+        if self.prune_depth:
+            self.evict_stale_branch(stale_block)
+
+    def evict_stale_branch(self, stale_block: Block):
+        block = stale_block
+        while block is not None and not block.get_metadata().children_hashes and not self.is_in_main_chain(block):
+            parent_block = block.get_metadata().parent
+            logging.info(f"Evicting stale block#{block.data.index}: {block.hash}")
+            del self.blockchain_blocks[block.hash]
+            self.blockchain_version += 1
+            self.blockchain_leaf_blocks.pop(block.hash, None)
+            self.unindex_block_transactions(block)
+            if self.block_store is not None:
+                self.block_store.evict(block.hash)
+            if parent_block is not None:
+                parent_block.get_metadata().children_hashes.remove(block.hash)
+            block = parent_block
+
+    def prune_blocks(self):
+        next_mining_base_block = self.get_next_mining_base_block()
+        prune_height = next_mining_base_block.get_metadata().height - self.prune_depth
+        if prune_height <= self.pruned_height:
+            return
+
+        for height in range(self.pruned_height + 1, prune_height + 1):
+            block = get_ancestor(next_mining_base_block, height)
+            if block is None:
+                continue
+            self.unindex_block_transactions(block)
+            block.data.transactions = []
+            block.get_metadata().unspent_transaction_outputs = None
+
+        oldest_kept_utxos = get_ancestor(next_mining_base_block,
+                                         prune_height + 1).get_metadata().unspent_transaction_outputs
+        if oldest_kept_utxos is not None:
+            oldest_kept_utxos.get_checkpoint().parent = None
+        logging.debug(f"Pruned block bodies and UTXO state up to block {prune_height}")
+        self.pruned_height = prune_height
+
     def get_next_mining_base_block(self) -> Block:
-        next_proper_block = sorted(self.blockchain_leaf_blocks.values(), key=lambda x: (-x.data.index))[0]
+        next_proper_block = self.best_block
 
         if self.evil_mode and self.evil_mining_last_block is not None and self.evil_mining_last_block.data.index > next_proper_block.data.index - self.block_abandance_height_diff:
             return self.evil_mining_last_block
 
         return next_proper_block
 
-    def get_dumped_blockchain(self):
-        chain = [self.blockchain_blocks[key].model_dump() for key in list(self.blockchain_blocks.keys())]
-        return sorted(chain, key=lambda x: (x["data"]["index"], x["data"]["timestamp"]))
+    def update_best_block(self, block: Block):
+        if self.best_block is None or self.is_heavier_chain(block, self.best_block):
+            self.best_block = block
+
+    @staticmethod
+    def is_heavier_chain(block: Block, other_block: Block) -> bool:
+        block_work = block.get_metadata().chain_work
+        other_block_work = other_block.get_metadata().chain_work
+        return block_work > other_block_work or (block_work == other_block_work and block.hash < other_block.hash)
+
+    @synchronized
+    def get_blockchain_etag(self, since_height: int) -> str:
+        tip_hash = self.best_block.hash if self.best_block is not None else "0"
+        return f"{tip_hash}-{self.blockchain_version}-{since_height}"
+
+    @synchronized
+    def get_blocks_since(self, since_height: int) -> List[Block]:
+        return sorted((block for block in self.blockchain_blocks.values() if block.data.index >= since_height),
+                      key=lambda x: (x.data.index, x.data.timestamp))
+
+    def get_serialized_block(self, block: Block) -> bytes:
+        if self.block_store is not None:
+            serialized_block = self.block_store.read_raw(block.hash)
+            if serialized_block is not None:
+                return serialized_block
+        return block.model_dump_json().encode()
+
+    def get_full_block(self, block: Block) -> Block:
+        if not block.data.transactions and self.block_store is not None:
+            serialized_block = self.block_store.read_raw(block.hash)
+            if serialized_block is not None:
+                return Block.model_validate_json(serialized_block)
+        return block
+
+    def serialize_blocks(self, blocks: List[Block]) -> bytes:
+        return b"[" + b",".join(self.get_serialized_block(block) for block in blocks) + b"]"
+
+    @synchronized
+    def get_main_chain_blocks(self, from_height: int, count: int) -> List[Block]:
+        next_mining_base_block = self.get_next_mining_base_block()
+        to_height = min(from_height + count - 1, next_mining_base_block.get_metadata().height)
+        if from_height < 0 or from_height > to_height:
+            return []
+
+        blocks = []
+        block = get_ancestor(next_mining_base_block, to_height)
+        while block is not None and block.get_metadata().height >= from_height:
+            blocks.append(block)
+            block = block.get_metadata().parent
+        return list(reversed(blocks))
+
+    @synchronized
+    def get_serialized_main_chain_blocks(self, from_height: int, count: int) -> bytes:
+        return self.serialize_blocks(self.get_main_chain_blocks(from_height, count))
+
+    def get_best_height(self) -> int:
+        if self.best_block is None:
+            return -1
+        return self.get_next_mining_base_block().get_metadata().height
+
+    def get_block_nth_ancestor(self, block: Block, n: int) -> Block | None:
+        return get_ancestor(block, block.get_metadata().height - n)
 
-    def get_block_nth_ancestor(self, block: Block, n: int):
-        if n == 0:
-            return block
-        return self.get_block_nth_ancestor(self.blockchain_blocks[block.data.previous_hash], n - 1)
+    def is_in_main_chain(self, block: Block) -> bool:
+        ancestor = get_ancestor(self.get_next_mining_base_block(), block.get_metadata().height)
+        return ancestor is not None and ancestor.hash == block.hash
 
     def get_difficulty_for_block(self, block: Block):
         if block.data.index == 0:
@@ -100,7 +297,7 @@ class NodeState:
 
         parent_block = self.blockchain_blocks[block.data.previous_hash]
         if block.data.index % self.difficulty_update_interval == 0:
-            last_recalculated_block = self.get_block_nth_ancestor(block, self.difficulty_update_interval)
+            last_recalculated_block = get_ancestor(parent_block, block.data.index - self.difficulty_update_interval)
             first_block_time = last_recalculated_block.data.timestamp
             last_block_time = parent_block.data.timestamp
             time_diff = last_block_time - first_block_time
@@ -117,8 +314,18 @@ class NodeState:
 
         return parent_block.data.difficulty
 
-    def restart_mining(self):
+    def request_new_work(self):
+        if self.new_work_requested_at is None:
+            self.new_work_requested_at = time.time()
         self.is_mining_container["value"] = False
+        self.new_work_event.set()
+
+    def notify_new_transactions(self):
+        # New transactions only wake an idle miner, a running nonce search picks them up with its next template
+        self.new_work_event.set()
+
+    def restart_mining(self):
+        self.request_new_work()
         logging.info("Mining will be restarted")
 
     def pause_mining(self):
@@ -128,6 +335,7 @@ class NodeState:
 
     def allow_mining(self):
         self.is_mining = True
+        self.new_work_event.set()
         logging.info("Mining allowed")
 
     def resume_mining_if_possible(self):
@@ -142,26 +350,121 @@ class NodeState:
                                    self.coinbase_amount)
         return coinbase
 
+    @synchronized
     def add_transaction_to_mempool(self, transaction: Transaction):
+        if transaction.txId in self.mempool:
+            logging.debug("Transaction already in mempool")
+            raise ValueError("Transaction already in mempool")
+
+        if self.mempool.get_conflicting_tx_id(transaction) is not None:
+            logging.info("Same transaction input already in mempool")
+            raise ValueError("Same transaction input already in mempool")
+
         if not validate_transaction(transaction,
                                     self.get_next_mining_base_block().get_metadata().unspent_transaction_outputs):
             logging.info("Transaction is invalid")
             raise ValueError("Transaction is invalid")
 
-        if transaction in self.mempool:
-            logging.debug("Transaction already in mempool")
-            raise ValueError("Transaction already in mempool")
+        self.mempool.add(transaction)
+        self.notify_new_transactions()
+        logging.debug(f"Transaction added to mempool: {transaction}")
 
-        staged_tx_ins = {}
-        for txIn in transaction.data.txIns:
-            if f"{txIn.txOutId}:{txIn.txOutIndex}" in self.mempool_tx_ins:
-                logging.info("Same transaction input already in mempool")
-                raise ValueError("Same transaction input already in mempool")
-            staged_tx_ins[f"{txIn.txOutId}:{txIn.txOutIndex}"] = transaction
+    @synchronized
+    def add_transactions_to_mempool(self, transactions: List[Transaction]) -> List[str | None]:
+        unspent_transaction_outputs = self.get_next_mining_base_block().get_metadata().unspent_transaction_outputs
+        errors: List[str | None] = [None] * len(transactions)
+        batch_tx_ids = set()
+        batch_outpoints = set()
+        candidates = []
+        for i, transaction in enumerate(transactions):
+            if transaction.txId in self.mempool or transaction.txId in batch_tx_ids:
+                errors[i] = "Transaction already in mempool"
+                continue
 
-        self.mempool.append(transaction)
-        self.mempool_tx_ins.update(staged_tx_ins)
-        logging.debug(f"Transaction added to mempool: {transaction}")
+            try:
+                outpoints = [get_outpoint_key(txIn.txOutId, txIn.txOutIndex) for txIn in transaction.data.txIns]
+            except ValueError as e:
+                errors[i] = str(e)
+                continue
+            if self.mempool.get_conflicting_tx_id(transaction) is not None or \
+                    any(outpoint in batch_outpoints for outpoint in outpoints):
+                errors[i] = "Same transaction input already in mempool"
+                continue
+
+            sender_address = validate_transaction_inputs(transaction, unspent_transaction_outputs)
+            if sender_address is None:
+                errors[i] = "Transaction is invalid"
+                continue
+
+            batch_tx_ids.add(transaction.txId)
+            batch_outpoints.update(outpoints)
+            candidates.append((i, transaction, sender_address))
+
+        signature_results = verify_transaction_signatures(
+            [(transaction, sender_address) for _, transaction, sender_address in candidates])
+        added = 0
+        for (i, transaction, _), is_valid in zip(candidates, signature_results):
+            if not is_valid:
+                errors[i] = "Transaction is invalid"
+                continue
+            self.mempool.add(transaction)
+            added += 1
+
+        if added:
+            self.notify_new_transactions()
+        logging.info(f"Added {added} of {len(transactions)} batch transactions to mempool")
+        return errors
+
+    @synchronized
+    def get_block_template_transactions(self, parent_block: Block, reserved_bytes: int) -> List[Transaction]:
+        if self.mempool_base_hash != parent_block.hash:
+            self.defrag_mempool(parent_block)
+
+        return self.mempool.select_transactions(self.max_block_transactions - 1,
+                                                self.max_block_bytes - reserved_bytes)
+
+    def is_block_known(self, block_hash: str) -> bool:
+        return block_hash in self.blockchain_blocks or block_hash in self.seen_blocks
+
+    def is_transaction_known(self, tx_id: str) -> bool:
+        return tx_id in self.mempool or tx_id in self.seen_transactions or tx_id in self.transaction_block_hashes
+
+    @synchronized
+    def get_inventory_data(self, block_hashes: List[str], tx_ids: List[str]) -> Tuple[List[Block], List[Transaction]]:
+        blocks = []
+        for block_hash in block_hashes:
+            block = self.blockchain_blocks.get(block_hash)
+            if block is not None and block.data.transactions:
+                blocks.append(block)
+
+        transactions = []
+        for tx_id in tx_ids:
+            transaction = self.mempool.get(tx_id)
+            if transaction is not None:
+                transactions.append(transaction)
+        return blocks, transactions
+
+    @synchronized
+    def get_compact_blocks(self, block_hashes: List[str]) -> List[CompactBlock]:
+        compact_blocks = []
+        for block_hash in block_hashes:
+            block = self.blockchain_blocks.get(block_hash)
+            if block is not None and block.data.transactions:
+                compact_blocks.append(create_compact_block(block))
+        return compact_blocks
+
+    @synchronized
+    def get_block_transactions(self, block_hash: str, indexes: List[int]) -> List[Transaction] | None:
+        block = self.blockchain_blocks.get(block_hash)
+        if block is None or not block.data.transactions:
+            return None
+        if any(not 0 <= index < len(block.data.transactions) for index in indexes):
+            return None
+        return [block.data.transactions[index] for index in indexes]
+
+    @synchronized
+    def match_compact_block(self, compact_block: CompactBlock) -> Tuple[List[Transaction | None], List[int]]:
+        return match_compact_block(compact_block, self.mempool)
 
     def add_peer(self, peer):
         if peer in self.connected_peers:
@@ -183,14 +486,22 @@ class NodeState:
     def print_mempool(self):
         logging.info(f"MemPool: {self.mempool}")
 
-    def append_block(self, block: Block):
+    @synchronized
+    def append_block(self, block: Block, trusted: bool = False):
         if not self.blockchain_blocks:
             if not block.is_genesis_block():
                 raise ValueError("Block is not genesis block")
             self.blockchain_blocks[block.hash] = block
+            self.blockchain_version += 1
             self.blockchain_leaf_blocks[block.hash] = block
-            utxos = {f"{block.data.transactions[0].txId}:0": block.data.transactions[0].data.txOuts[0]}
-            block.get_metadata().unspent_transaction_outputs = block.get_metadata().unspent_transaction_outputs | utxos
+            link_block(block, None)
+            coinbase = block.data.transactions[0]
+            utxos = {get_outpoint_key(coinbase.txId, 0): Utxo.from_tx_out(coinbase.data.txOuts[0])}
+            block.get_metadata().unspent_transaction_outputs = UtxoSet.root(utxos)
+            block.get_metadata().chain_work = block.get_work()
+            self.update_best_block(block)
+            self.index_block_transactions(block)
+            self.store_block(block, trusted)
             return
 
         if block.hash in self.blockchain_blocks:
@@ -200,21 +511,33 @@ class NodeState:
             raise ValueError("Invalid block, previous hash does not match any block")
 
         parent_block = self.blockchain_blocks[block.data.previous_hash]
+        if parent_block.get_metadata().unspent_transaction_outputs is None:
+            raise ValueError("Invalid block, parent block state is not available")
+        previous_mining_base_block = self.get_next_mining_base_block()
 
-        if not validate_block(block, self.coinbase_amount, parent_block.get_metadata().unspent_transaction_outputs,
-                              self.get_difficulty_for_block(block), parent_block.data.index + 1):
+        if not trusted and not validate_block(block, self.coinbase_amount,
+                                              parent_block.get_metadata().unspent_transaction_outputs,
+                                              self.get_difficulty_for_block(block), parent_block.data.index + 1):
             raise ValueError("Invalid block")
         self.blockchain_blocks[block.hash] = block
+        self.blockchain_version += 1
         self.blockchain_leaf_blocks[block.hash] = block
-        parent_block.get_metadata().children_hashes.append(block.hash)
+        link_block(block, parent_block)
         block.get_metadata().unspent_transaction_outputs = self.build_block_utxos(block, parent_block)
-
-        if block.data.index > self.get_next_mining_base_block().data.index:
-            self.restart_mining()
+        block.get_metadata().chain_work = parent_block.get_metadata().chain_work + block.get_work()
+        self.update_best_block(block)
+        self.index_block_transactions(block)
+        self.store_block(block, trusted)
 
         if block.data.previous_hash in self.blockchain_leaf_blocks:
             del self.blockchain_leaf_blocks[block.data.previous_hash]
+
+        if self.get_next_mining_base_block() is not previous_mining_base_block:
+            self.restart_mining()
         self.process_stale_blocks()
+        if self.prune_depth:
+            self.prune_blocks()
+        self.update_address_index()
         self.defrag_mempool(block)
         logging.debug(f"Block added to blockchain: {block}")
         # self.allow_mining()
@@ -229,11 +552,17 @@ class NodeState:
             #     self.evil_mining_last_block = block
 
     def defrag_mempool(self, block: Block):
+        next_mining_base_block = self.get_next_mining_base_block()
+        if self.mempool_base_hash == next_mining_base_block.hash:
+            return
+
         logging.debug("Defragging mempool")
-        self.mempool = [t for t in self.mempool if t not in block.data.transactions]
-        self.mempool_tx_ins = {key: value for key, value in self.mempool_tx_ins.items() if
-                               value not in block.data.transactions}
-        logging.debug("Mempool defragged")
+        if next_mining_base_block is block and self.mempool_base_hash == block.data.previous_hash:
+            removed = self.mempool.remove_for_block(block)
+        else:
+            removed = self.mempool.revalidate(next_mining_base_block.get_metadata().unspent_transaction_outputs)
+        self.mempool_base_hash = next_mining_base_block.hash
+        logging.debug(f"Mempool defragged, removed {len(removed)} transactions")
 
     def create_genesis_block(self):
         logging.info("Creating genesis block")
@@ -245,24 +574,141 @@ class NodeState:
             miner_config_container=self.is_mining_container)
         self.append_block(genesis)
 
-    def load_blockchain(self, blockchain: dict):
-        for block in blockchain:
-            self.append_block(Block(**block))
+    def store_block(self, block: Block, trusted: bool):
+        if self.block_store is not None and not trusted and self.snapshot_block_hash is None:
+            self.block_store.append(block)
+
+    def load_stored_blocks(self) -> int:
+        loaded_blocks = 0
+        for block in self.block_store.load_blocks():
+            if block.hash in self.blockchain_blocks:
+                continue
+            self.append_block(block, trusted=True)
+            loaded_blocks += 1
+        logging.info(f"Loaded {loaded_blocks} blocks from block store")
+        return loaded_blocks
+
+    @synchronized
+    def create_utxo_snapshot(self, block_hash: str | None = None) -> dict:
+        base_block = self.blockchain_blocks[block_hash] if block_hash else self.get_next_mining_base_block()
+        blocks = []
+        block = base_block
+        while block is not None and len(blocks) <= self.difficulty_update_interval:
+            blocks.append(block)
+            block = block.get_metadata().parent
+        return create_snapshot(list(reversed(blocks)))
+
+    @synchronized
+    def load_utxo_snapshot(self, snapshot: dict):
+        if self.blockchain_blocks:
+            raise ValueError("Snapshot can only be loaded into an empty blockchain")
+
+        blocks = [Block(**block) for block in snapshot["blocks"]]
+        if not blocks or blocks[-1].hash != snapshot["blockHash"]:
+            raise ValueError("Snapshot blocks do not end with the snapshot block")
+
+        parent_block = None
+        for block in blocks:
+            if not block.is_hash_valid():
+                raise ValueError(f"Snapshot block {block.data.index} hash is invalid")
+            if not block.data.is_merkle_root_valid():
+                raise ValueError(f"Snapshot block {block.data.index} merkle root is invalid")
+            if parent_block is not None and block.data.previous_hash != parent_block.hash:
+                raise ValueError(f"Snapshot block {block.data.index} does not extend the previous block")
+            link_block(block, parent_block)
+            block.get_metadata().unspent_transaction_outputs = None
+            self.blockchain_blocks[block.hash] = block
+            self.blockchain_version += 1
+            self.index_block_transactions(block)
+            parent_block = block
+
+        chain_work = snapshot["chainWork"]
+        if not isinstance(chain_work, int) or chain_work < sum(block.get_work() for block in blocks):
+            raise ValueError("Snapshot chain work is less than the work of its blocks")
+        for block in reversed(blocks):
+            block.get_metadata().chain_work = chain_work
+            chain_work -= block.get_work()
+
+        base_block = blocks[-1]
+        base_block.get_metadata().unspent_transaction_outputs = UtxoSet.root(deserialize_utxos(snapshot["utxos"]))
+        self.blockchain_leaf_blocks[base_block.hash] = base_block
+        self.update_best_block(base_block)
+        self.snapshot_block_hash = base_block.hash
+        self.snapshot_content_hash = snapshot["contentHash"]
+        self.update_address_index()
+        logging.info(f"Loaded UTXO snapshot at block {base_block.data.index} with {len(snapshot['utxos'])} UTXOs")
+
+    def validate_snapshot_history(self, blockchain: List[Block]) -> bool:
+        snapshot_block_hash = self.snapshot_block_hash
+        snapshot_height = self.blockchain_blocks[snapshot_block_hash].data.index
+        logging.info(f"Validating blockchain history up to snapshot block {snapshot_height}")
+
+        history = NodeState()
+        history.is_mining = False
+        history.coinbase_amount = self.coinbase_amount
+        history.starting_difficulty = self.starting_difficulty
+        history.difficulty_update_interval = self.difficulty_update_interval
+        history.target_block_time_seconds = self.target_block_time_seconds
+        history.utxo_checkpoint_interval = self.utxo_checkpoint_interval
+        try:
+            for block in blockchain:
+                if block.data.index <= snapshot_height:
+                    history.append_block(block)
+        except ValueError as e:
+            logging.error(f"Blockchain history is invalid: {e}")
+
+        snapshot_block = history.blockchain_blocks.get(snapshot_block_hash)
+        if snapshot_block is None or calculate_snapshot_hash(
+                snapshot_block_hash, snapshot_block.get_metadata().chain_work,
+                serialize_utxos(snapshot_block.get_metadata().unspent_transaction_outputs)) != self.snapshot_content_hash:
+            logging.error("UTXO snapshot does not match the validated history, mining paused")
+            self.pause_mining()
+            return False
+
+        with self.lock:
+            for block in sorted(self.blockchain_blocks.values(), key=lambda x: (x.data.index, x.data.timestamp)):
+                if block.hash not in history.blockchain_blocks:
+                    history.append_block(Block(hash=block.hash, data=block.data), trusted=True)
+
+            self.blockchain_blocks = history.blockchain_blocks
+            self.blockchain_version += 1
+            self.blockchain_leaf_blocks = history.blockchain_leaf_blocks
+            self.transaction_block_hashes = history.transaction_block_hashes
+            self.best_block = history.best_block
+            self.address_index = AddressIndex()
+            self.mempool_base_hash = None
+            self.evil_mining_last_block = None
+            self.snapshot_block_hash = None
+            self.snapshot_content_hash = None
+            self.pruned_height = -1
+            if self.block_store is not None:
+                for block in sorted(self.blockchain_blocks.values(), key=lambda x: (x.data.index, x.data.timestamp)):
+                    self.block_store.append(block)
+            if self.prune_depth:
+                self.prune_blocks()
+            self.update_address_index()
+            self.restart_mining()
+
+        logging.info(f"Blockchain history validated, snapshot block {snapshot_height} matches")
+        return True
 
-    def build_block_utxos(self, block: Block, parent_block: Block):
-        utxos = parent_block.get_metadata().unspent_transaction_outputs.copy()
+    def build_block_utxos(self, block: Block, parent_block: Block) -> UtxoSet:
+        parent_utxos = parent_block.get_metadata().unspent_transaction_outputs
+        created = {}
+        spent = {}
         for transaction in block.data.transactions:
             for txIn in transaction.data.txIns:
                 if txIn.txOutId == "0" and txIn.txOutIndex == block.data.index:
                     continue
 
                 logging.info(f"Removing UTXO: {txIn.txOutId}:{txIn.txOutIndex}")
-                del utxos[f"{txIn.txOutId}:{txIn.txOutIndex}"]
+                key = get_outpoint_key(txIn.txOutId, txIn.txOutIndex)
+                spent[key] = parent_utxos[key]
 
             for i, txOut in enumerate(transaction.data.txOuts):
                 logging.info(f"Adding UTXO: {transaction.txId}:{i}")
-                utxos[f"{transaction.txId}:{i}"] = txOut
-        return utxos
+                created[get_outpoint_key(transaction.txId, i)] = Utxo.from_tx_out(txOut)
+        return parent_utxos.extend(created, spent, self.utxo_checkpoint_interval)
 
 
 nodeState = NodeState()
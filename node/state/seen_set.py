@@ -0,0 +1,60 @@
+import threading
+from collections import OrderedDict
+
+
+class SeenSet:
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self.items: OrderedDict = OrderedDict()
+        self.lock = threading.Lock()
+
+    def add(self, item: str) -> bool:
+        with self.lock:
+            if item in self.items:
+                self.items.move_to_end(item)
+                return False
+            self.items[item] = None
+            while len(self.items) > self.max_size:
+                self.items.popitem(last=False)
+            return True
+
+    def discard(self, item: str):
+        with self.lock:
+            self.items.pop(item, None)
+
+    def __contains__(self, item: str) -> bool:
+        return item in self.items
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+
+class AnnouncerTable:
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self.announcers: OrderedDict = OrderedDict()
+        self.lock = threading.Lock()
+
+    def add(self, item: str, peer: str):
+        with self.lock:
+            peers = self.announcers.setdefault(item, [])
+            if peer not in peers:
+                peers.append(peer)
+            self.announcers.move_to_end(item)
+            while len(self.announcers) > self.max_size:
+                self.announcers.popitem(last=False)
+
+    def pop(self, item: str, skip: str | None = None) -> str | None:
+        with self.lock:
+            peers = [peer for peer in self.announcers.pop(item, []) if peer != skip]
+            if not peers:
+                return None
+            if len(peers) > 1:
+                self.announcers[item] = peers[1:]
+            return peers[0]
+
+    def discard(self, item: str):
+        with self.lock:
+            self.announcers.pop(item, None)
@@ -1,17 +1,20 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
 
-from state.transaction_data import TransactionData, TxOut, TxIn
+from state.transaction_data import TransactionData, TxOut, TxIn, TRANSACTION_VERSION_BINARY
 
 
 def create_coinbase(address: str, block_index: int, amount: int):
     transaction_data = TransactionData(txIns=[TxIn(txOutId="0", txOutIndex=block_index)],
-                                       txOuts=[TxOut(address=address, amount=amount)])
+                                       txOuts=[TxOut(address=address, amount=amount)],
+                                       version=TRANSACTION_VERSION_BINARY)
     return Transaction(txId=transaction_data.calculate_hash(),
                        signature="",
                        data=transaction_data)
 
 
 class Transaction(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     txId: str
     signature: str
     data: TransactionData
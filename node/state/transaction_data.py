@@ -1,10 +1,26 @@
 import hashlib
 from typing import List
 
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict, PrivateAttr
+
+TRANSACTION_VERSION_JSON = 1
+TRANSACTION_VERSION_BINARY = 2
+BINARY_INT_BYTES = 8
+BINARY_LENGTH_BYTES = 2
+
+
+def encode_binary_str(value: str) -> bytes:
+    raw = value.encode()
+    return len(raw).to_bytes(BINARY_LENGTH_BYTES, "big") + raw
+
+
+def encode_binary_int(value: int) -> bytes:
+    return value.to_bytes(BINARY_INT_BYTES, "big", signed=True)
 
 
 class TxIn(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     txOutId: str
     txOutIndex: int
 
@@ -16,6 +32,8 @@ class TxIn(BaseModel):
 
 
 class TxOut(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     address: str
     amount: int
 
@@ -27,11 +45,43 @@ class TxOut(BaseModel):
 
 
 class TransactionData(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     txIns: List[TxIn]
     txOuts: List[TxOut]
+    version: int = TRANSACTION_VERSION_JSON
+    _hash: str | None = PrivateAttr(default=None)
 
     def calculate_hash(self):
-        return hashlib.sha256(self.model_dump_json().encode()).hexdigest()
+        if self._hash is None:
+            self._hash = hashlib.sha256(self.serialize_for_hash()).hexdigest()
+        return self._hash
+
+    def serialize_for_hash(self) -> bytes:
+        if self.version == TRANSACTION_VERSION_JSON:
+            return self.model_dump_json(exclude={"version"}).encode()
+        if self.version == TRANSACTION_VERSION_BINARY:
+            return self.serialize_binary()
+        raise ValueError(f"Unsupported transaction version: {self.version}")
+
+    def serialize_binary(self) -> bytes:
+        try:
+            parts = [self.version.to_bytes(1, "big"), len(self.txIns).to_bytes(BINARY_LENGTH_BYTES, "big")]
+            for txIn in self.txIns:
+                parts.append(encode_binary_str(txIn.txOutId))
+                parts.append(encode_binary_int(txIn.txOutIndex))
+            parts.append(len(self.txOuts).to_bytes(BINARY_LENGTH_BYTES, "big"))
+            for txOut in self.txOuts:
+                parts.append(encode_binary_str(txOut.address))
+                parts.append(encode_binary_int(txOut.amount))
+        except OverflowError as e:
+            raise ValueError(f"Transaction does not fit the binary format: {e}")
+        return b"".join(parts)
+
+    def model_copy(self, *, update=None, deep=False):
+        copy = super().model_copy(update=update, deep=deep)
+        copy._hash = None
+        return copy
 
     def __eq__(self, other):
-        return self.txIns == other.txIns and self.txOuts == other.txOuts
+        return self.txIns == other.txIns and self.txOuts == other.txOuts and self.version == other.version
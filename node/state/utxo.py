@@ -0,0 +1,75 @@
+import threading
+from typing import Dict, List, Tuple
+
+from state.transaction_data import TxOut
+
+OUTPOINT_INDEX_BYTES = 4
+
+
+def get_outpoint_key(tx_out_id: str, tx_out_index: int) -> bytes:
+    try:
+        tx_out_id_bytes = bytes.fromhex(tx_out_id)
+        if tx_out_id_bytes.hex() != tx_out_id:
+            raise ValueError("Transaction id is not lowercase hex")
+        return tx_out_id_bytes + tx_out_index.to_bytes(OUTPOINT_INDEX_BYTES, "big")
+    except (ValueError, OverflowError) as e:
+        raise ValueError(f"Invalid outpoint {tx_out_id}:{tx_out_index}: {e}")
+
+
+def split_outpoint_key(key: bytes) -> Tuple[str, int]:
+    return key[:-OUTPOINT_INDEX_BYTES].hex(), int.from_bytes(key[-OUTPOINT_INDEX_BYTES:], "big")
+
+
+class AddressTable:
+
+    def __init__(self):
+        self.address_ids: Dict[str, int] = {}
+        self.addresses: List[str] = []
+        self.lock = threading.Lock()
+
+    def get_id(self, address: str) -> int:
+        address_id = self.address_ids.get(address)
+        if address_id is not None:
+            return address_id
+
+        with self.lock:
+            address_id = self.address_ids.get(address)
+            if address_id is None:
+                address_id = len(self.addresses)
+                self.addresses.append(address)
+                self.address_ids[address] = address_id
+            return address_id
+
+    def find_id(self, address: str) -> int | None:
+        return self.address_ids.get(address)
+
+    def get_address(self, address_id: int) -> str:
+        return self.addresses[address_id]
+
+
+addressTable = AddressTable()
+
+
+class Utxo:
+    __slots__ = ("address_id", "amount")
+
+    def __init__(self, address_id: int, amount: int):
+        self.address_id = address_id
+        self.amount = amount
+
+    @staticmethod
+    def from_tx_out(tx_out: TxOut) -> 'Utxo':
+        return Utxo(addressTable.get_id(tx_out.address), tx_out.amount)
+
+    @property
+    def address(self) -> str:
+        return addressTable.get_address(self.address_id)
+
+    def __eq__(self, other):
+        return self.address_id == other.address_id and self.amount == other.amount
+
+    def __hash__(self):
+        return hash((self.address_id, self.amount))
+
+    def __repr__(self):
+        return f"Utxo(address={self.address}, amount={self.amount})"
@@ -0,0 +1,107 @@
+from collections.abc import Mapping
+
+from state.utxo import Utxo
+
+_MISSING = object()
+DEFAULT_CHECKPOINT_INTERVAL = 16
+
+
+class UtxoSet(Mapping):
+
+    def __init__(self, parent: 'UtxoSet | None', created: dict, spent: dict,
+                 checkpoint_interval: int = DEFAULT_CHECKPOINT_INTERVAL):
+        self.parent = parent
+        self.created = created
+        self.spent = spent
+        self.flat: dict | None = None
+        self.size = (parent.size if parent is not None else 0) + len(created) - len(spent)
+        self.checkpoint_interval = checkpoint_interval
+
+    @staticmethod
+    def root(utxos: dict) -> 'UtxoSet':
+        utxo_set = UtxoSet(None, utxos, {})
+        utxo_set.flat = utxos
+        return utxo_set
+
+    def extend(self, created: dict, spent: dict, checkpoint_interval: int) -> 'UtxoSet':
+        child = UtxoSet(self, created, spent, checkpoint_interval)
+        if child.get_checkpoint_distance() >= checkpoint_interval:
+            child.checkpoint()
+        return child
+
+    def checkpoint(self):
+        previous_checkpoint = self.get_checkpoint()
+        self.flat = self.to_dict()
+
+        older_checkpoint = previous_checkpoint.parent.get_checkpoint() if previous_checkpoint.parent else None
+        if older_checkpoint is not None and older_checkpoint.parent is not None:
+            older_checkpoint.flat = None
+
+    def get_checkpoint(self) -> 'UtxoSet':
+        layer = self
+        while layer.flat is None:
+            layer = layer.parent
+        return layer
+
+    def get_checkpoint_distance(self) -> int:
+        distance = 0
+        layer = self
+        while layer.flat is None and distance < self.checkpoint_interval:
+            layer = layer.parent
+            distance += 1
+        return distance
+
+    def get(self, key, default=None) -> Utxo | None:
+        layer = self
+        while True:
+            flat = layer.flat
+            if flat is not None:
+                return flat.get(key, default)
+            value = layer.created.get(key, _MISSING)
+            if value is not _MISSING:
+                return value
+            if key in layer.spent:
+                return default
+            layer = layer.parent
+
+    def to_dict(self) -> dict:
+        flat = self.flat
+        if flat is not None:
+            return dict(flat)
+
+        layers = []
+        layer = self
+        while True:
+            flat = layer.flat
+            if flat is not None:
+                break
+            layers.append(layer)
+            layer = layer.parent
+
+        utxos = dict(flat)
+        for layer in reversed(layers):
+            for key in layer.spent:
+                del utxos[key]
+            utxos.update(layer.created)
+        return utxos
+
+    def __getitem__(self, key) -> Utxo:
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key) -> bool:
+        return self.get(key, _MISSING) is not _MISSING
+
+    def __iter__(self):
+        return iter(self.to_dict())
+
+    def __len__(self) -> int:
+        return self.size
+
+    def items(self):
+        flat = self.flat
+        if flat is not None:
+            return flat.items()
+        return self.to_dict().items()
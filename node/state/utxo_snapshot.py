@@ -0,0 +1,60 @@
+import hashlib
+import json
+from typing import List
+
+from state.block import Block
+from state.utxo import Utxo, addressTable, get_outpoint_key, split_outpoint_key
+
+SNAPSHOT_VERSION = 2
+
+
+def serialize_utxos(utxos) -> list:
+    serialized_utxos = []
+    for key, utxo in utxos.items():
+        tx_out_id, tx_out_index = split_outpoint_key(key)
+        serialized_utxos.append([tx_out_id, tx_out_index, utxo.address, utxo.amount])
+    serialized_utxos.sort()
+    return serialized_utxos
+
+
+def deserialize_utxos(serialized_utxos: list) -> dict:
+    return {get_outpoint_key(tx_out_id, tx_out_index): Utxo(addressTable.get_id(address), amount)
+            for tx_out_id, tx_out_index, address, amount in serialized_utxos}
+
+
+def calculate_snapshot_hash(block_hash: str, chain_work: int, serialized_utxos: list) -> str:
+    content_hash = hashlib.sha256(f"{block_hash}\n{chain_work}\n".encode())
+    for tx_out_id, tx_out_index, address, amount in serialized_utxos:
+        content_hash.update(f"{tx_out_id}:{tx_out_index}:{address}:{amount}\n".encode())
+    return content_hash.hexdigest()
+
+
+def create_snapshot(blocks: List[Block]) -> dict:
+    base_block = blocks[-1]
+    serialized_utxos = serialize_utxos(base_block.get_metadata().unspent_transaction_outputs)
+    return {
+        "version": SNAPSHOT_VERSION,
+        "blockHash": base_block.hash,
+        "height": base_block.data.index,
+        "chainWork": base_block.get_metadata().chain_work,
+        "blocks": [block.model_dump() for block in blocks],
+        "utxos": serialized_utxos,
+        "contentHash": calculate_snapshot_hash(base_block.hash, base_block.get_metadata().chain_work, serialized_utxos)
+    }
+
+
+def write_snapshot(path: str, snapshot: dict):
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump(snapshot, file, separators=(",", ":"))
+
+
+def read_snapshot(path: str) -> dict:
+    with open(path, "r", encoding="utf-8") as file:
+        snapshot = json.load(file)
+
+    if snapshot.get("version") != SNAPSHOT_VERSION:
+        raise ValueError(f"Unsupported snapshot version: {snapshot.get('version')}")
+    content_hash = calculate_snapshot_hash(snapshot["blockHash"], snapshot["chainWork"], snapshot["utxos"])
+    if content_hash != snapshot["contentHash"]:
+        raise ValueError("Snapshot content hash does not match")
+    return snapshot
@@ -0,0 +1,237 @@
+import struct
+from typing import List, Tuple
+
+from pydantic import ValidationError
+
+from state.block import Block
+from state.compact_block import SHORT_ID_BYTES, CompactBlock
+from state.transaction import Transaction
+
+WIRE_CONTENT_TYPE = "application/x-kayaccoin"
+WIRE_MAGIC = b"KYC"
+COMPACT_BLOCKS_MAGIC = b"KYB"
+WIRE_VERSION = 1
+
+HASH_BYTES = 32
+PUBLIC_KEY_BYTES = 33
+FIELD_RAW = 0
+FIELD_TEXT = 1
+
+TIMESTAMP = struct.Struct(">d")
+
+
+def encode_varint(value: int, parts: List[bytes]):
+    encoded = bytearray()
+    while value > 0x7f:
+        encoded.append((value & 0x7f) | 0x80)
+        value >>= 7
+    encoded.append(value)
+    parts.append(bytes(encoded))
+
+
+def encode_signed_varint(value: int, parts: List[bytes]):
+    encode_varint(value * 2 if value >= 0 else -value * 2 - 1, parts)
+
+
+def encode_bytes(value: bytes, parts: List[bytes]):
+    encode_varint(len(value), parts)
+    parts.append(value)
+
+
+def encode_hex_field(value: str, size: int | None, parts: List[bytes]):
+    try:
+        raw = bytes.fromhex(value)
+    except ValueError:
+        raw = None
+
+    if raw is not None and raw.hex() == value and (size is None or len(raw) == size):
+        parts.append(bytes([FIELD_RAW]))
+        if size is None:
+            encode_bytes(raw, parts)
+        else:
+            parts.append(raw)
+    else:
+        parts.append(bytes([FIELD_TEXT]))
+        encode_bytes(value.encode(), parts)
+
+
+def encode_transaction(transaction: Transaction, parts: List[bytes]):
+    encode_hex_field(transaction.txId, HASH_BYTES, parts)
+    encode_hex_field(transaction.signature, None, parts)
+    encode_signed_varint(transaction.data.version, parts)
+    encode_varint(len(transaction.data.txIns), parts)
+    for txIn in transaction.data.txIns:
+        encode_hex_field(txIn.txOutId, HASH_BYTES, parts)
+        encode_signed_varint(txIn.txOutIndex, parts)
+    encode_varint(len(transaction.data.txOuts), parts)
+    for txOut in transaction.data.txOuts:
+        encode_hex_field(txOut.address, PUBLIC_KEY_BYTES, parts)
+        encode_signed_varint(txOut.amount, parts)
+
+
+def encode_block_header(block: Block | CompactBlock, parts: List[bytes]):
+    encode_hex_field(block.hash, HASH_BYTES, parts)
+    encode_signed_varint(block.data.index, parts)
+    encode_hex_field(block.data.previous_hash, HASH_BYTES, parts)
+    encode_signed_varint(block.data.difficulty, parts)
+    parts.append(TIMESTAMP.pack(block.data.timestamp))
+    encode_signed_varint(block.data.nonce, parts)
+    encode_hex_field(block.data.merkle_root, HASH_BYTES, parts)
+
+
+def encode_block(block: Block, parts: List[bytes]):
+    encode_block_header(block, parts)
+    encode_varint(len(block.data.transactions), parts)
+    for transaction in block.data.transactions:
+        encode_transaction(transaction, parts)
+
+
+def encode_message(blocks: List[Block], transactions: List[Transaction]) -> bytes:
+    parts = [WIRE_MAGIC, bytes([WIRE_VERSION])]
+    encode_varint(len(blocks), parts)
+    for block in blocks:
+        encode_block(block, parts)
+    encode_varint(len(transactions), parts)
+    for transaction in transactions:
+        encode_transaction(transaction, parts)
+    return b"".join(parts)
+
+
+def encode_compact_blocks(compact_blocks: List[CompactBlock]) -> bytes:
+    parts = [COMPACT_BLOCKS_MAGIC, bytes([WIRE_VERSION])]
+    encode_varint(len(compact_blocks), parts)
+    for compact_block in compact_blocks:
+        encode_block_header(compact_block, parts)
+        encode_varint(len(compact_block.shortIds), parts)
+        for short_id in compact_block.shortIds:
+            encode_hex_field(short_id, SHORT_ID_BYTES, parts)
+        encode_varint(len(compact_block.prefilled), parts)
+        for prefilled in compact_block.prefilled:
+            encode_varint(prefilled.index, parts)
+            encode_transaction(prefilled.transaction, parts)
+    return b"".join(parts)
+
+
+class WireReader:
+
+    def __init__(self, data: bytes):
+        self.data = data
+        self.position = 0
+
+    def read(self, length: int) -> bytes:
+        end = self.position + length
+        if end > len(self.data):
+            raise ValueError("Wire message is truncated")
+        value = self.data[self.position:end]
+        self.position = end
+        return value
+
+    def read_varint(self) -> int:
+        if self.position >= len(self.data):
+            raise ValueError("Wire message is truncated")
+        byte = self.data[self.position]
+        self.position += 1
+        if byte < 0x80:
+            return byte
+
+        value = byte & 0x7f
+        shift = 7
+        while True:
+            byte = self.read(1)[0]
+            value |= (byte & 0x7f) << shift
+            if byte < 0x80:
+                return value
+            shift += 7
+
+    def read_signed_varint(self) -> int:
+        value = self.read_varint()
+        return -((value + 1) >> 1) if value & 1 else value >> 1
+
+    def read_bytes(self) -> bytes:
+        return self.read(self.read_varint())
+
+    def read_hex_field(self, size: int | None) -> str:
+        field_type = self.read_varint()
+        if field_type == FIELD_RAW:
+            if size is None:
+                size = self.read_varint()
+            end = self.position + size
+            if end > len(self.data):
+                raise ValueError("Wire message is truncated")
+            value = self.data[self.position:end].hex()
+            self.position = end
+            return value
+        if field_type == FIELD_TEXT:
+            return self.read_bytes().decode()
+        raise ValueError(f"Unknown wire field type: {field_type}")
+
+    def read_transaction(self) -> dict:
+        read_hex_field = self.read_hex_field
+        read_signed_varint = self.read_signed_varint
+        tx_id = read_hex_field(HASH_BYTES)
+        signature = read_hex_field(None)
+        version = read_signed_varint()
+        tx_ins = [{"txOutId": read_hex_field(HASH_BYTES), "txOutIndex": read_signed_varint()}
+                  for _ in range(self.read_varint())]
+        tx_outs = [{"address": read_hex_field(PUBLIC_KEY_BYTES), "amount": read_signed_varint()}
+                   for _ in range(self.read_varint())]
+        return {"txId": tx_id, "signature": signature, "data": {"txIns": tx_ins, "txOuts": tx_outs, "version": version}}
+
+    def read_block_header(self) -> dict:
+        block_hash = self.read_hex_field(HASH_BYTES)
+        index = self.read_signed_varint()
+        previous_hash = self.read_hex_field(HASH_BYTES)
+        difficulty = self.read_signed_varint()
+        timestamp = TIMESTAMP.unpack(self.read(TIMESTAMP.size))[0]
+        nonce = self.read_signed_varint()
+        merkle_root = self.read_hex_field(HASH_BYTES)
+        return {"hash": block_hash, "data": {"index": index, "previous_hash": previous_hash, "difficulty": difficulty,
+                                             "timestamp": timestamp, "nonce": nonce, "merkle_root": merkle_root,
+                                             "transactions": []}}
+
+    def read_block(self) -> dict:
+        block = self.read_block_header()
+        block["data"]["transactions"] = [self.read_transaction() for _ in range(self.read_varint())]
+        return block
+
+    def read_compact_block(self) -> dict:
+        compact_block = self.read_block_header()
+        compact_block["shortIds"] = [self.read_hex_field(SHORT_ID_BYTES) for _ in range(self.read_varint())]
+        compact_block["prefilled"] = [{"index": self.read_varint(), "transaction": self.read_transaction()}
+                                      for _ in range(self.read_varint())]
+        return compact_block
+
+    def read_header(self, magic: bytes):
+        if self.read(len(magic)) != magic:
+            raise ValueError("Not a wire message")
+        version = self.read(1)[0]
+        if version != WIRE_VERSION:
+            raise ValueError(f"Unsupported wire version: {version}")
+
+    def check_end(self):
+        if self.position != len(self.data):
+            raise ValueError("Wire message has trailing data")
+
+
+def decode_message(data: bytes) -> Tuple[List[Block], List[Transaction]]:
+    reader = WireReader(data)
+    reader.read_header(WIRE_MAGIC)
+    blocks = [reader.read_block() for _ in range(reader.read_varint())]
+    transactions = [reader.read_transaction() for _ in range(reader.read_varint())]
+    reader.check_end()
+    try:
+        return [Block.model_validate(block) for block in blocks], \
+            [Transaction.model_validate(transaction) for transaction in transactions]
+    except ValidationError as e:
+        raise ValueError(f"Invalid wire message: {e}")
+
+
+def decode_compact_blocks(data: bytes) -> List[CompactBlock]:
+    reader = WireReader(data)
+    reader.read_header(COMPACT_BLOCKS_MAGIC)
+    compact_blocks = [reader.read_compact_block() for _ in range(reader.read_varint())]
+    reader.check_end()
+    try:
+        return [CompactBlock.model_validate(compact_block) for compact_block in compact_blocks]
+    except ValidationError as e:
+        raise ValueError(f"Invalid wire message: {e}")
@@ -0,0 +1,8 @@
+import os
+import sys
+
+NODE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CLIENT_DIR = os.path.join(os.path.dirname(NODE_DIR), "client")
+
+sys.path.insert(0, NODE_DIR)
+sys.path.append(CLIENT_DIR)
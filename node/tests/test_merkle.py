@@ -0,0 +1,136 @@
+import hashlib
+import logging
+
+import pytest
+
+from block_proof import verify_transaction_proof
+from state.compact_block import create_compact_block, fill_compact_block
+from state.transaction import create_coinbase
+from utils.merkle import EMPTY_MERKLE_ROOT, calculate_merkle_root, get_merkle_branch, hash_merkle_pair, \
+    verify_merkle_branch
+from utils.mining import build_block
+from validation.validation import validate_block
+
+
+def make_tx_ids(count):
+    return [hashlib.sha256(str(i).encode()).hexdigest() for i in range(count)]
+
+
+def test_empty_root():
+    assert calculate_merkle_root([]) == EMPTY_MERKLE_ROOT
+
+
+def test_single_leaf_is_root():
+    tx_id = make_tx_ids(1)[0]
+    assert calculate_merkle_root([tx_id]) == tx_id
+    assert get_merkle_branch([tx_id], 0) == []
+
+
+def test_odd_leaf_count_duplicates_last_leaf():
+    a, b, c = make_tx_ids(3)
+    expected = hash_merkle_pair(hash_merkle_pair(a, b), hash_merkle_pair(c, c))
+    assert calculate_merkle_root([a, b, c]) == expected
+
+
+def test_odd_count_on_upper_level():
+    tx_ids = make_tx_ids(5)
+    level = [hash_merkle_pair(tx_ids[0], tx_ids[1]), hash_merkle_pair(tx_ids[2], tx_ids[3]),
+             hash_merkle_pair(tx_ids[4], tx_ids[4])]
+    level = [hash_merkle_pair(level[0], level[1]), hash_merkle_pair(level[2], level[2])]
+    assert calculate_merkle_root(tx_ids) == hash_merkle_pair(level[0], level[1])
+
+
+@pytest.mark.parametrize("count", [1, 2, 3, 4, 5, 7, 8, 13])
+def test_branch_verifies_every_leaf(count):
+    tx_ids = make_tx_ids(count)
+    root = calculate_merkle_root(tx_ids)
+    for index, tx_id in enumerate(tx_ids):
+        branch = get_merkle_branch(tx_ids, index)
+        assert verify_merkle_branch(tx_id, branch, root)
+        assert not verify_merkle_branch(make_tx_ids(count + 1)[-1], branch, root)
+
+
+def test_branch_rejects_wrong_root():
+    tx_ids = make_tx_ids(6)
+    branch = get_merkle_branch(tx_ids, 3)
+    assert not verify_merkle_branch(tx_ids[3], branch, calculate_merkle_root(tx_ids[:5]))
+
+
+def make_block(transaction_count):
+    transactions = [create_coinbase("00" * 33, 1, 50 + i) for i in range(transaction_count)]
+    block = build_block(1, "0" * 64, 1700000000.0, 0, 0, transactions)
+    block.calculate_hash()
+    return block
+
+
+def make_proof(block, tx_index):
+    tx_ids = [transaction.txId for transaction in block.data.transactions]
+    return {
+        "txId": tx_ids[tx_index],
+        "blockHash": block.hash,
+        "header": block.data.model_dump(exclude={"transactions"}),
+        "branch": get_merkle_branch(tx_ids, tx_index)
+    }
+
+
+@pytest.mark.parametrize("tx_index", [0, 1, 2])
+def test_client_verifies_node_proof(tx_index):
+    block = make_block(3)
+    assert verify_transaction_proof(make_proof(block, tx_index))
+
+
+def test_client_rejects_proof_for_other_transaction():
+    block = make_block(3)
+    proof = make_proof(block, 1)
+    proof["txId"] = block.data.transactions[2].txId
+    assert not verify_transaction_proof(proof)
+
+
+def test_client_rejects_tampered_header_root():
+    block = make_block(3)
+    proof = make_proof(block, 0)
+    proof["header"]["merkle_root"] = calculate_merkle_root(make_tx_ids(3))
+    assert not verify_transaction_proof(proof)
+
+
+def test_block_with_wrong_root_is_rejected(caplog):
+    caplog.set_level(logging.INFO)
+    block = make_block(2)
+    block.data.merkle_root = calculate_merkle_root(make_tx_ids(2))
+    block.calculate_hash()
+    assert block.is_hash_valid()
+    assert not validate_block(block, 50, {}, 0, 1)
+    assert "Block merkle root is invalid" in caplog.text
+
+
+def make_mutated_block(block):
+    transactions = block.data.transactions + [block.data.transactions[-1]]
+    mutated = block.model_copy(update={"data": block.data.model_copy(update={"transactions": transactions})})
+    mutated.calculate_hash()
+    return mutated
+
+
+def test_duplicated_last_transaction_keeps_root_and_hash():
+    block = make_block(3)
+    mutated = make_mutated_block(block)
+    assert mutated.data.calculate_merkle_root() == block.data.merkle_root
+    assert mutated.hash == block.hash
+    assert block.data.is_merkle_root_valid()
+    assert not mutated.data.is_merkle_root_valid()
+
+
+def test_block_with_duplicated_transactions_is_rejected(caplog):
+    caplog.set_level(logging.INFO)
+    mutated = make_mutated_block(make_block(3))
+    assert mutated.is_hash_valid()
+    assert not validate_block(mutated, 50, {}, 0, 1)
+    assert "Block contains duplicated transactions" in caplog.text
+
+
+def test_compact_block_with_duplicated_transactions_is_not_filled():
+    mutated = make_mutated_block(make_block(3))
+    compact_block = create_compact_block(mutated)
+    slots = [None] * compact_block.get_transaction_count()
+    slots[0] = mutated.data.transactions[0]
+    missing_indexes = list(range(1, len(slots)))
+    assert fill_compact_block(compact_block, slots, missing_indexes, mutated.data.transactions[1:]) is None
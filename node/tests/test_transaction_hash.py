@@ -0,0 +1,96 @@
+import hashlib
+from typing import List
+
+import pytest
+from pydantic import BaseModel, ValidationError
+
+from state.transaction import Transaction, create_coinbase
+from state.transaction_data import TRANSACTION_VERSION_BINARY, TRANSACTION_VERSION_JSON, TransactionData, TxIn, \
+    TxOut
+
+
+class LegacyTxIn(BaseModel):
+    txOutId: str
+    txOutIndex: int
+
+
+class LegacyTxOut(BaseModel):
+    address: str
+    amount: int
+
+
+class LegacyTransactionData(BaseModel):
+    txIns: List[LegacyTxIn]
+    txOuts: List[LegacyTxOut]
+
+    def calculate_hash(self):
+        return hashlib.sha256(self.model_dump_json().encode()).hexdigest()
+
+
+TX_INS = [{"txOutId": "ab" * 32, "txOutIndex": 0}, {"txOutId": "cd" * 32, "txOutIndex": 3}]
+TX_OUTS = [{"address": "02" + "11" * 32, "amount": 40}, {"address": "03" + "22" * 32, "amount": -1}]
+
+
+def make_transaction_data(**kwargs) -> TransactionData:
+    return TransactionData(txIns=[TxIn(**txIn) for txIn in TX_INS],
+                           txOuts=[TxOut(**txOut) for txOut in TX_OUTS], **kwargs)
+
+
+def test_default_version_is_json():
+    assert make_transaction_data().version == TRANSACTION_VERSION_JSON
+
+
+def test_v1_hash_matches_legacy_hash():
+    legacy = LegacyTransactionData(txIns=TX_INS, txOuts=TX_OUTS)
+    assert make_transaction_data().calculate_hash() == legacy.calculate_hash()
+
+
+def test_v1_hash_matches_legacy_json_payload():
+    payload = ('{"txIns":[{"txOutId":"' + "ab" * 32 + '","txOutIndex":0},{"txOutId":"' + "cd" * 32 +
+               '","txOutIndex":3}],"txOuts":[{"address":"02' + "11" * 32 + '","amount":40},{"address":"03' +
+               "22" * 32 + '","amount":-1}]}')
+    assert make_transaction_data().calculate_hash() == hashlib.sha256(payload.encode()).hexdigest()
+
+
+def test_v1_hash_of_parsed_legacy_transaction():
+    legacy = LegacyTransactionData(txIns=TX_INS, txOuts=TX_OUTS)
+    transaction = Transaction(txId=legacy.calculate_hash(), signature="", data=legacy.model_dump())
+    assert transaction.data.version == TRANSACTION_VERSION_JSON
+    assert transaction.data.calculate_hash() == transaction.txId
+
+
+def test_binary_hash_differs_from_json_hash():
+    binary = make_transaction_data(version=TRANSACTION_VERSION_BINARY)
+    assert binary.calculate_hash() == hashlib.sha256(binary.serialize_binary()).hexdigest()
+    assert binary.calculate_hash() != make_transaction_data().calculate_hash()
+
+
+def test_unknown_version_is_rejected():
+    with pytest.raises(ValueError):
+        make_transaction_data(version=99).calculate_hash()
+
+
+def test_coinbase_hash_matches_tx_id():
+    coinbase = create_coinbase("02" + "11" * 32, 7, 50)
+    assert coinbase.data.version == TRANSACTION_VERSION_BINARY
+    assert coinbase.data.calculate_hash() == coinbase.txId
+
+
+@pytest.mark.parametrize("model, field, value", [
+    (TxIn(txOutId="ab" * 32, txOutIndex=0), "txOutIndex", 1),
+    (TxOut(address="02" + "11" * 32, amount=40), "amount", 41),
+    (make_transaction_data(), "txOuts", []),
+    (make_transaction_data(), "version", TRANSACTION_VERSION_BINARY),
+    (create_coinbase("02" + "11" * 32, 7, 50), "txId", "00" * 32),
+])
+def test_frozen_models_reject_mutation(model, field, value):
+    with pytest.raises(ValidationError):
+        setattr(model, field, value)
+
+
+def test_cached_hash_follows_model_copy():
+    transaction_data = make_transaction_data()
+    original_hash = transaction_data.calculate_hash()
+    copy = transaction_data.model_copy(update={"txOuts": [TxOut(address="02" + "11" * 32, amount=41)]})
+    assert transaction_data.calculate_hash() == original_hash
+    assert copy.calculate_hash() != original_hash
@@ -0,0 +1,154 @@
+import hashlib
+
+import pytest
+import requests
+
+from api.node_comm import get_data
+from client.broadcast import WIRE_ACCEPT, decode_data_response
+from flask_app import flask_app
+from state.compact_block import create_compact_block
+from state.node_state import nodeState
+from state.transaction import Transaction, create_coinbase
+from state.transaction_data import TransactionData, TxIn, TxOut
+from state.wire_format import FIELD_RAW, FIELD_TEXT, WIRE_CONTENT_TYPE, WireReader, decode_compact_blocks, \
+    decode_message, encode_compact_blocks, encode_hex_field, encode_message
+from utils.mining import build_block
+
+ADDRESS = "02" + "11" * 32
+
+
+def make_transaction(seed: int, **overrides) -> Transaction:
+    data = TransactionData(txIns=[TxIn(txOutId=hashlib.sha256(str(seed).encode()).hexdigest(), txOutIndex=seed)],
+                           txOuts=[TxOut(address=ADDRESS, amount=seed * 10), TxOut(address=ADDRESS, amount=-seed)])
+    values = {"txId": data.calculate_hash(), "signature": "3045" + "ab" * 35, "data": data}
+    values.update(overrides)
+    return Transaction(**values)
+
+
+def make_block(index: int, previous_hash: str, transaction_count: int):
+    transactions = [create_coinbase(ADDRESS, index, 50)] + [make_transaction(i + 1) for i in range(transaction_count)]
+    block = build_block(index, previous_hash, 1700000000.123456, 3, 2 ** 40 + index, transactions)
+    block.calculate_hash()
+    return block
+
+
+def encode_field(value: str, size: int | None) -> bytes:
+    parts = []
+    encode_hex_field(value, size, parts)
+    return b"".join(parts)
+
+
+def test_block_and_transaction_round_trip():
+    blocks = [make_block(1, "ab" * 32, 3), make_block(2, "cd" * 32, 0)]
+    transactions = [make_transaction(7), make_transaction(8)]
+    decoded_blocks, decoded_transactions = decode_message(encode_message(blocks, transactions))
+    assert [block.model_dump() for block in decoded_blocks] == [block.model_dump() for block in blocks]
+    assert decoded_transactions == transactions
+    assert all(transaction.data.calculate_hash() == transaction.txId for transaction in decoded_transactions)
+
+
+def test_empty_message_round_trip():
+    assert decode_message(encode_message([], [])) == ([], [])
+
+
+@pytest.mark.parametrize("value, size", [
+    ("ab" * 32, 32),
+    ("", None),
+    ("0a1b", None),
+])
+def test_hex_fields_use_raw_encoding(value, size):
+    encoded = encode_field(value, size)
+    assert encoded[0] == FIELD_RAW
+    assert WireReader(encoded).read_hex_field(size) == value
+
+
+@pytest.mark.parametrize("value, size", [
+    ("0", 32),
+    ("AB" * 32, 32),
+    ("ab" * 31, 32),
+    ("abc", None),
+    ("not hex", None),
+    ("zaża", None),
+])
+def test_non_canonical_fields_fall_back_to_text(value, size):
+    encoded = encode_field(value, size)
+    assert encoded[0] == FIELD_TEXT
+    assert WireReader(encoded).read_hex_field(size) == value
+
+
+def test_text_fields_round_trip_in_block():
+    genesis = make_block(0, "0", 1)
+    odd_transaction = make_transaction(3, txId="TX-" + "AB" * 4, signature="")
+    decoded_blocks, decoded_transactions = decode_message(encode_message([genesis], [odd_transaction]))
+    assert decoded_blocks[0].data.previous_hash == "0"
+    assert decoded_blocks[0].data.transactions[0].data.txIns[0].txOutId == "0"
+    assert decoded_blocks[0].model_dump() == genesis.model_dump()
+    assert decoded_transactions == [odd_transaction]
+
+
+def test_compact_block_round_trip():
+    compact_blocks = [create_compact_block(make_block(5, "ef" * 32, 4))]
+    decoded = decode_compact_blocks(encode_compact_blocks(compact_blocks))
+    assert [compact_block.model_dump() for compact_block in decoded] == \
+           [compact_block.model_dump() for compact_block in compact_blocks]
+
+
+@pytest.mark.parametrize("data", [
+    b"",
+    b"XYZ\x01\x00\x00",
+    b"KYC\x02\x00\x00",
+])
+def test_invalid_header_is_rejected(data):
+    with pytest.raises(ValueError):
+        decode_message(data)
+
+
+def test_truncated_and_trailing_data_is_rejected():
+    encoded = encode_message([make_block(1, "ab" * 32, 2)], [make_transaction(4)])
+    with pytest.raises(ValueError):
+        decode_message(encoded[:-1])
+    with pytest.raises(ValueError):
+        decode_message(encoded + b"\x00")
+
+
+def test_compact_block_magic_is_not_a_data_message():
+    with pytest.raises(ValueError):
+        decode_message(encode_compact_blocks([]))
+
+
+@pytest.fixture
+def inventory(monkeypatch):
+    blocks = [make_block(1, "ab" * 32, 2)]
+    transactions = [make_transaction(9)]
+    monkeypatch.setattr(nodeState, "get_inventory_data", lambda block_hashes, tx_ids: (blocks, transactions))
+    return blocks, transactions
+
+
+def request_data(accept: str | None) -> requests.Response:
+    headers = {"Accept": accept} if accept is not None else {}
+    with flask_app.test_request_context("/getData", method="POST", json={"blocks": [], "transactions": []},
+                                        headers=headers):
+        flask_response = flask_app.make_response(get_data())
+    response = requests.Response()
+    response.status_code = flask_response.status_code
+    response.headers.update(flask_response.headers)
+    response._content = flask_response.get_data()
+    return response
+
+
+@pytest.mark.parametrize("accept, content_type", [
+    (WIRE_ACCEPT, WIRE_CONTENT_TYPE),
+    (WIRE_CONTENT_TYPE, WIRE_CONTENT_TYPE),
+    ("application/json", "application/json"),
+    ("*/*", "application/json"),
+    (None, "application/json"),
+    (f"application/json, {WIRE_CONTENT_TYPE};q=0.5", "application/json"),
+])
+def test_content_negotiation(inventory, accept, content_type):
+    blocks, transactions = inventory
+    response = request_data(accept)
+    assert response.headers["Content-Type"].startswith(content_type)
+
+    decoded_blocks, decoded_transactions = decode_data_response(response)
+    assert [block.model_dump() for block in decoded_blocks] == [block.model_dump() for block in blocks]
+    assert decoded_transactions == transactions
@@ -0,0 +1,43 @@
+import hashlib
+from typing import List
+
+EMPTY_MERKLE_ROOT = "0" * 64
+
+
+def hash_merkle_pair(left: str, right: str) -> str:
+    return hashlib.sha256((left + right).encode()).hexdigest()
+
+
+def calculate_merkle_root(tx_ids: List[str]) -> str:
+    if not tx_ids:
+        return EMPTY_MERKLE_ROOT
+
+    level = list(tx_ids)
+    while len(level) > 1:
+        if len(level) % 2 == 1:
+            level.append(level[-1])
+        level = [hash_merkle_pair(level[i], level[i + 1]) for i in range(0, len(level), 2)]
+    return level[0]
+
+
+def get_merkle_branch(tx_ids: List[str], index: int) -> List[dict]:
+    branch = []
+    level = list(tx_ids)
+    while len(level) > 1:
+        if len(level) % 2 == 1:
+            level.append(level[-1])
+        sibling_index = index ^ 1
+        branch.append({"hash": level[sibling_index], "isLeft": sibling_index < index})
+        level = [hash_merkle_pair(level[i], level[i + 1]) for i in range(0, len(level), 2)]
+        index //= 2
+    return branch
+
+
+def verify_merkle_branch(tx_id: str, branch: List[dict], merkle_root: str) -> bool:
+    current = tx_id
+    for node in branch:
+        if node["isLeft"]:
+            current = hash_merkle_pair(node["hash"], current)
+        else:
+            current = hash_merkle_pair(current, node["hash"])
+    return current == merkle_root
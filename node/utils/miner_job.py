@@ -1,41 +1,114 @@
 import logging
+import threading
 import time
 import random
 
 from client.broadcast import broadcast_block_into_network
 from state.node_state import nodeState
-from utils.mining import build_block, mine_block
-from validation.validation import validate_transaction
+from utils.mining import build_block, mine_block, get_hashrate
 
 
-def miner_scheduled_job():
-    logging.info("Mining scheduled job")
-    if len(nodeState.mempool) > -1 and nodeState.is_mining:
+def build_block_template():
+    with nodeState.lock:
         parent_block = nodeState.get_next_mining_base_block()
-        available_utxos = parent_block.get_metadata().unspent_transaction_outputs
-
-        transactions_to_include = []
-        for transaction in nodeState.mempool:
-            if validate_transaction(transaction, available_utxos):
-                logging.info(f"Transaction {transaction.txId} will be mined")
-                transactions_to_include.append(transaction)
-            else:
-                logging.info(f"Transaction {transaction.txId} is invalid")
-                nodeState.mempool.remove(transaction)
-
-        blockchain_length_at_start = parent_block.data.index + 1
-        block = build_block(index=blockchain_length_at_start, previous_hash=parent_block.hash,
+        block = build_block(index=parent_block.data.index + 1, previous_hash=parent_block.hash,
                             difficulty=0,
                             timestamp=time.time(), nonce=random.getrandbits(32), transactions=[])
-        block.data.transactions = [nodeState.create_coinbase_transaction_for_block(block)] + transactions_to_include
+        coinbase = nodeState.create_coinbase_transaction_for_block(block)
+        transactions_to_include = nodeState.get_block_template_transactions(parent_block,
+                                                                            len(coinbase.model_dump_json()))
+        logging.info(f"Mining block {block.data.index} with {len(transactions_to_include)} transactions")
+
+        block.data.transactions = [coinbase] + transactions_to_include
+        block.data.update_merkle_root()
         block.data.difficulty = nodeState.get_difficulty_for_block(block)
-        block = mine_block(block, nodeState.is_mining_container)
-        if block is None or not nodeState.is_mining or blockchain_length_at_start != nodeState.get_next_mining_base_block().data.index + 1:
+        return block
+
+
+class MinerController:
+
+    def __init__(self):
+        self.thread: threading.Thread | None = None
+        self.blocks_mined = 0
+        self.templates_started = 0
+        self.idle_seconds = 0.0
+        self.restarts = 0
+        self.last_restart_latency = 0.0
+        self.total_restart_latency = 0.0
+        self.max_restart_latency = 0.0
+        self.started_at = None
+
+    def start(self):
+        self.started_at = time.time()
+        self.thread = threading.Thread(target=self.run, name="miner", daemon=True)
+        self.thread.start()
+
+    def run(self):
+        idle_since = time.time()
+        while True:
+            if not nodeState.is_mining:
+                logging.info("Mining is disabled, waiting for new work")
+                nodeState.new_work_event.wait()
+                nodeState.new_work_event.clear()
+                continue
+
+            nodeState.new_work_event.clear()
             nodeState.resume_mining_if_possible()
+            requested_at = nodeState.new_work_requested_at
+            nodeState.new_work_requested_at = None
+            try:
+                block = build_block_template()
+            except Exception as e:
+                logging.error(f"Could not build block template: {e}")
+                nodeState.new_work_event.wait(1)
+                continue
+
+            mining_started_at = time.time()
+            self.idle_seconds += mining_started_at - idle_since
+            self.templates_started += 1
+            if requested_at is not None:
+                self.record_restart_latency(mining_started_at - requested_at)
+
+            block = mine_block(block, nodeState.is_mining_container)
+            idle_since = time.time()
+            if block is None:
+                continue
+
+            self.submit_mined_block(block)
+
+    def submit_mined_block(self, block):
+        try:
+            with nodeState.lock:
+                if not nodeState.is_mining or block.data.previous_hash != nodeState.get_next_mining_base_block().hash:
+                    logging.info(f"Mined block {block.data.index} is no longer on the best tip, discarding")
+                    return
+                nodeState.append_block(block)
+        except ValueError as e:
+            logging.error(f"Mined block was rejected: {e}")
             return
 
-        nodeState.append_block(block)
+        self.blocks_mined += 1
         broadcast_block_into_network(block, nodeState.get_callback_address())
-    else:
-        logging.info("No transactions in mempool or mining is disabled")
-        return
+
+    def record_restart_latency(self, latency: float):
+        self.restarts += 1
+        self.last_restart_latency = latency
+        self.total_restart_latency += latency
+        self.max_restart_latency = max(self.max_restart_latency, latency)
+
+    def get_stats(self) -> dict:
+        uptime = time.time() - self.started_at if self.started_at else 0.0
+        return {
+            "blocksMined": self.blocks_mined,
+            "templatesStarted": self.templates_started,
+            "hashrate": get_hashrate(),
+            "idleSeconds": self.idle_seconds,
+            "idleRatio": self.idle_seconds / uptime if uptime else 0.0,
+            "restarts": self.restarts,
+            "lastRestartLatency": self.last_restart_latency,
+            "avgRestartLatency": self.total_restart_latency / self.restarts if self.restarts else 0.0,
+            "maxRestartLatency": self.max_restart_latency
+        }
+
+
+minerController = MinerController()
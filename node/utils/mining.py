@@ -1,23 +1,145 @@
+import hashlib
 import logging
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
 
-from state.block import Block
+from state.block import Block, get_difficulty_target
 from state.block_data import BlockData
 
+STOP_CHECK_INTERVAL = 64
+ABORT_POLL_SECONDS = 0.005
+
+_worker_stop_event = None
+_single_thread_hashrate = {"value": 0.0}
+
 
 def build_block(index: int, previous_hash: str, timestamp, difficulty: int, nonce: int, transactions: list) -> Block:
-    return Block(hash="",
-                 data=BlockData(index=index, previous_hash=previous_hash, difficulty=difficulty, timestamp=timestamp,
-                                nonce=nonce,
-                                transactions=transactions))
+    block = Block(hash="",
+                  data=BlockData(index=index, previous_hash=previous_hash, difficulty=difficulty, timestamp=timestamp,
+                                 nonce=nonce,
+                                 transactions=transactions))
+    block.data.update_merkle_root()
+    return block
+
+
+def _scan_nonces(midstate, suffix: bytes, target: int, start_nonce: int, step: int, count: int):
+    nonce = start_nonce
+    for _ in range(count):
+        sha = midstate.copy()
+        sha.update(b"%d" % nonce)
+        sha.update(suffix)
+        digest = sha.digest()
+        if int.from_bytes(digest, "big") < target:
+            return nonce, digest.hex()
+        nonce += step
+    return None, None
+
+
+def _init_worker(stop_event):
+    global _worker_stop_event
+    _worker_stop_event = stop_event
+
+
+def _search_nonces(prefix: bytes, suffix: bytes, target: int, start_nonce: int, step: int):
+    midstate = hashlib.sha256(prefix)
+    hashes = 0
+    nonce = start_nonce
+    while not _worker_stop_event.is_set():
+        found_nonce, block_hash = _scan_nonces(midstate, suffix, target, nonce, step, STOP_CHECK_INTERVAL)
+        if found_nonce is not None:
+            return found_nonce, block_hash, hashes + (found_nonce - nonce) // step + 1
+        hashes += STOP_CHECK_INTERVAL
+        nonce += STOP_CHECK_INTERVAL * step
+    return None, None, hashes
+
+
+def _finish_block(block: Block, nonce: int) -> Block:
+    block.data.nonce = nonce
+    block.calculate_hash()
+    logging.info(f"Block {block.data.index} mined: {block.hash}, nonce: {block.data.nonce}")
+    return block
+
+
+class MiningPool:
+
+    def __init__(self, workers: int):
+        context = multiprocessing.get_context("spawn")
+        self.workers = workers
+        self.stop_event = context.Event()
+        self.executor = ProcessPoolExecutor(max_workers=workers,
+                                            mp_context=context,
+                                            initializer=_init_worker,
+                                            initargs=(self.stop_event,))
+        self.hashrate = 0.0
+
+    def mine_block(self, block: Block, miner_config_container: dict) -> Block | None:
+        self.stop_event.clear()
+        started_at = time.time()
+        prefix, suffix = block.data.get_nonce_template()
+        target = get_difficulty_target(block.data.difficulty)
+        futures = [self.executor.submit(_search_nonces, prefix, suffix, target, block.data.nonce + i, self.workers)
+                   for i in range(self.workers)]
+
+        found = None
+        pending = set(futures)
+        while pending and found is None:
+            done, pending = wait(pending, timeout=ABORT_POLL_SECONDS, return_when=FIRST_COMPLETED)
+            for future in done:
+                nonce, _, _ = future.result()
+                if nonce is not None:
+                    found = nonce
+                    break
+            if not miner_config_container["value"]:
+                break
+
+        self.stop_event.set()
+        total_hashes = sum(future.result()[2] for future in futures)
+        self.hashrate = total_hashes / max(time.time() - started_at, 1e-9)
+        logging.info(f"Mining pool hashrate: {self.hashrate:.0f} H/s ({self.workers} workers)")
+
+        if found is None:
+            logging.info("Mining aborted")
+            return None
+
+        return _finish_block(block, found)
+
+    def shutdown(self):
+        self.stop_event.set()
+        self.executor.shutdown(wait=True)
+
+
+mining_pool: MiningPool | None = None
+
+
+def init_mining_pool(workers: int):
+    global mining_pool
+    if workers > 1:
+        mining_pool = MiningPool(workers)
+        logging.info(f"Mining pool started with {workers} workers")
+
+
+def get_hashrate() -> float:
+    return mining_pool.hashrate if mining_pool is not None else _single_thread_hashrate["value"]
 
 
 def mine_block(block: Block, miner_config_container: dict) -> Block | None:
-    block.hash = block.calculate_hash()
-    while not bin(int(block.hash, 16))[2:].zfill(256).startswith("0" * block.data.difficulty):
-        block.data.nonce += 1
-        block.hash = block.calculate_hash()
+    if mining_pool is not None:
+        return mining_pool.mine_block(block, miner_config_container)
+
+    started_at = time.time()
+    prefix, suffix = block.data.get_nonce_template()
+    midstate = hashlib.sha256(prefix)
+    target = get_difficulty_target(block.data.difficulty)
+    nonce = block.data.nonce
+    while True:
+        found_nonce, _ = _scan_nonces(midstate, suffix, target, nonce, 1, STOP_CHECK_INTERVAL)
+        if found_nonce is not None:
+            break
+        nonce += STOP_CHECK_INTERVAL
         if not miner_config_container["value"]:
             logging.info("Mining aborted")
             return None
-    logging.info(f"Block {block.data.index} mined: {block.hash}, nonce: {block.data.nonce}")
-    return block
+    hashes = found_nonce - block.data.nonce + 1
+    _single_thread_hashrate["value"] = hashes / max(time.time() - started_at, 1e-9)
+    return _finish_block(block, found_nonce)
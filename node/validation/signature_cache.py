@@ -0,0 +1,41 @@
+import threading
+from collections import OrderedDict
+
+
+class SignatureCache:
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self.entries: OrderedDict = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def contains(self, tx_id: str, signature: str, public_key: str) -> bool:
+        key = (tx_id, signature, public_key)
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return True
+            self.misses += 1
+            return False
+
+    def add(self, tx_id: str, signature: str, public_key: str):
+        key = (tx_id, signature, public_key)
+        with self.lock:
+            self.entries[key] = None
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def get_stats(self) -> dict:
+        return {
+            "size": len(self.entries),
+            "maxSize": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses
+        }
+
+
+signatureCache = SignatureCache(max_size=100000)
@@ -1,4 +1,6 @@
 import logging
+from functools import lru_cache
+from typing import List
 
 from cryptography.exceptions import InvalidSignature
 from cryptography.hazmat.primitives import hashes
@@ -6,6 +8,11 @@ from cryptography.hazmat.primitives.asymmetric import ec
 
 from state.block import Block
 from state.transaction import Transaction
+from state.utxo import get_outpoint_key
+from validation.signature_cache import signatureCache
+from validation.verification_pool import run_signature_checks
+
+PUBLIC_KEY_CACHE_SIZE = 4096
 
 
 def validate_block(block: Block, expected_coinbase_amount: int, unspent_transaction_outputs: dict,
@@ -18,6 +25,14 @@ def validate_block(block: Block, expected_coinbase_amount: int, unspent_transact
         logging.info("Block hash is invalid")
         return False
 
+    if block.data.has_duplicate_transactions():
+        logging.info("Block contains duplicated transactions")
+        return False
+
+    if block.data.merkle_root != block.data.calculate_merkle_root():
+        logging.info("Block merkle root is invalid")
+        return False
+
     if block.data.difficulty != expected_block_difficulty:
         logging.info("Block difficulty is invalid")
         return False
@@ -27,10 +42,13 @@ def validate_block(block: Block, expected_coinbase_amount: int, unspent_transact
         logging.info("Coinbase transaction is invalid")
         return False
 
+    transactions_with_senders = []
     for transaction in block.data.transactions[1:]:
-        if not validate_transaction(transaction, unspent_transaction_outputs):
+        sender_address = validate_transaction_inputs(transaction, unspent_transaction_outputs)
+        if sender_address is None:
             logging.info("Block contains invalid transaction")
             return False
+        transactions_with_senders.append((transaction, sender_address))
 
     all_tx_ins = [txIn for transaction in block.data.transactions for txIn in transaction.data.txIns]
     all_unique_tx_ins = set(all_tx_ins)
@@ -38,11 +56,19 @@ def validate_block(block: Block, expected_coinbase_amount: int, unspent_transact
         logging.info("Block contains duplicated transaction inputs")
         return False
 
+    if not all(verify_transaction_signatures(transactions_with_senders)):
+        logging.info("Block contains transaction with invalid signature")
+        return False
+
     return True
 
 
 def validate_coinbase_transaction(transaction: Transaction, expected_coinbase_amount: int) -> bool:
-    data_hash = transaction.data.calculate_hash()
+    try:
+        data_hash = transaction.data.calculate_hash()
+    except ValueError as e:
+        logging.info(f"Coinbase transaction hash cannot be calculated: {e}")
+        return False
 
     if transaction.txId != data_hash:
         logging.info("Coinbase transaction hash is invalid")
@@ -75,71 +101,129 @@ def validate_coinbase_transaction(transaction: Transaction, expected_coinbase_am
 
 
 def validate_transaction(transaction: Transaction, unspent_transaction_outputs: dict) -> bool:
-    data_hash = transaction.data.calculate_hash()
+    sender_address = validate_transaction_inputs(transaction, unspent_transaction_outputs)
+    if sender_address is None:
+        return False
+
+    if signatureCache.contains(transaction.txId, transaction.signature, sender_address):
+        return True
+
+    if not verify_transaction_signature(transaction.txId, transaction.signature, sender_address,
+                                        [txOut.address for txOut in transaction.data.txOuts]):
+        return False
+    signatureCache.add(transaction.txId, transaction.signature, sender_address)
+    return True
+
+
+def verify_transaction_signatures(transactions_with_senders: list) -> List[bool]:
+    results = [True] * len(transactions_with_senders)
+    pending = [i for i, (transaction, sender_address) in enumerate(transactions_with_senders)
+               if not signatureCache.contains(transaction.txId, transaction.signature, sender_address)]
+    pending_results = run_signature_checks(verify_transaction_signature, [
+        (transaction.txId, transaction.signature, sender_address,
+         [txOut.address for txOut in transaction.data.txOuts])
+        for transaction, sender_address in (transactions_with_senders[i] for i in pending)])
+
+    for i, is_valid in zip(pending, pending_results):
+        transaction, sender_address = transactions_with_senders[i]
+        results[i] = is_valid
+        if is_valid:
+            signatureCache.add(transaction.txId, transaction.signature, sender_address)
+    return results
+
+
+def validate_transaction_inputs(transaction: Transaction, unspent_transaction_outputs: dict) -> str | None:
+    try:
+        data_hash = transaction.data.calculate_hash()
+    except ValueError as e:
+        logging.info(f"Transaction hash cannot be calculated: {e}")
+        return None
 
     if transaction.txId != data_hash:
         logging.info("Transaction hash is invalid")
-        return False
+        return None
 
     if len(transaction.data.txIns) == 0:
         logging.info("Transaction has no inputs")
-        return False
+        return None
 
     if len(transaction.data.txOuts) == 0:
         logging.info("Transaction has no outputs")
-        return False
+        return None
 
     if len(transaction.data.txIns) != len(set(transaction.data.txIns)):
         logging.info("Transaction inputs are not unique")
-        return False
+        return None
 
     unique_input_address = set()
     transaction_inputs_txids = []
+    input_amount = 0
     for txIn in transaction.data.txIns:
-        uTxO = unspent_transaction_outputs.get(f"{txIn.txOutId}:{txIn.txOutIndex}")
+        try:
+            uTxO = unspent_transaction_outputs.get(get_outpoint_key(txIn.txOutId, txIn.txOutIndex))
+        except ValueError:
+            logging.info("Transaction input is malformed")
+            return None
         if uTxO is None:
             logging.info("Transaction input is already spent or does not exist")
-            return False
+            return None
         if txIn.txOutId in transaction_inputs_txids:
             logging.info(f"Utxo {txIn.txOutId} is already used in this transaction")
-            return False
+            return None
         transaction_inputs_txids.append(txIn.txOutId)
         unique_input_address.add(uTxO.address)
+        input_amount += uTxO.amount
 
     if len(unique_input_address) != 1:
         logging.info("Transaction inputs are not coming from same address")
-        return False
-    sender_address = list(unique_input_address)[0]
+        return None
 
-    if validate_pub_key_str(sender_address) is False:
+    if sum([txOut.amount for txOut in transaction.data.txOuts]) != input_amount:
+        logging.info("Transaction output amount does not match input amount")
+        return None
+
+    return list(unique_input_address)[0]
+
+
+def verify_transaction_signature(tx_id: str, signature: str, sender_address: str, output_addresses: list) -> bool:
+    pub_key = load_public_key(sender_address)
+    if pub_key is None:
         logging.info("Transaction input address is invalid")
         return False
 
     try:
-        pub_key = ec.EllipticCurvePublicKey.from_encoded_point(ec.SECP256R1(), bytes.fromhex(sender_address))
-        pub_key.verify(bytes.fromhex(transaction.signature), data_hash.encode(), ec.ECDSA(hashes.SHA256()))
-    except InvalidSignature:
+        pub_key.verify(bytes.fromhex(signature), tx_id.encode(), ec.ECDSA(hashes.SHA256()))
+    except (InvalidSignature, ValueError):
         logging.info("Transaction signature is invalid")
         return False
 
-    for txOut in transaction.data.txOuts:
-        if validate_pub_key_str(txOut.address) is False:
+    for address in output_addresses:
+        if validate_pub_key_str(address) is False:
             logging.info("Transaction output address is invalid")
             return False
 
-    if sum([txOut.amount for txOut in transaction.data.txOuts]) != sum(
-            [unspent_transaction_outputs.get(f"{txIn.txOutId}:{txIn.txOutIndex}").amount for txIn in
-             transaction.data.txIns]):
-        logging.info("Transaction output amount does not match input amount")
-        return False
-
     return True
 
+
 def validate_pub_key_str(public_key_str: str) -> bool:
+    return load_public_key(public_key_str) is not None
+
+
+@lru_cache(maxsize=PUBLIC_KEY_CACHE_SIZE)
+def load_public_key(public_key_str: str) -> ec.EllipticCurvePublicKey | None:
     try:
         if len(public_key_str) != 66 or public_key_str[:2] not in ["02", "03"]:
-            return False
-        ec.EllipticCurvePublicKey.from_encoded_point(ec.SECP256R1(), bytes.fromhex(public_key_str))
-        return True
+            return None
+        return ec.EllipticCurvePublicKey.from_encoded_point(ec.SECP256R1(), bytes.fromhex(public_key_str))
     except ValueError:
-        return False
+        return None
+
+
+def get_public_key_cache_stats() -> dict:
+    cache_info = load_public_key.cache_info()
+    return {
+        "size": cache_info.currsize,
+        "maxSize": cache_info.maxsize,
+        "hits": cache_info.hits,
+        "misses": cache_info.misses
+    }
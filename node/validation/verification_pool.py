@@ -0,0 +1,25 @@
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, List
+
+PARALLEL_VERIFICATION_THRESHOLD = 64
+
+verification_pool: ProcessPoolExecutor | None = None
+verification_workers = 1
+
+
+def init_verification_pool(workers: int):
+    global verification_pool, verification_workers
+    if workers > 1:
+        verification_workers = workers
+        verification_pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+        logging.info(f"Signature verification pool started with {workers} workers")
+
+
+def run_signature_checks(check: Callable[..., bool], jobs: List[tuple]) -> List[bool]:
+    if verification_pool is None or len(jobs) < PARALLEL_VERIFICATION_THRESHOLD:
+        return [check(*job) for job in jobs]
+
+    chunksize = max(1, len(jobs) // (verification_workers * 4))
+    return list(verification_pool.map(check, *zip(*jobs), chunksize=chunksize))